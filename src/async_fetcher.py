@@ -0,0 +1,212 @@
+"""
+Concurrent download of listing pages with asyncio.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import metrics
+from http_session import ACCEPT_ENCODING, aiohttp_trace_config, log_stats
+from rate_limiter import MAX_RETRIES, RETRY_STATUSES, parse_retry_after, retry_delay, throttle_for
+
+
+class HostLimiter:
+    """
+    Limit the number of requests in flight to each host.
+
+    The limit is the host throttle's current AIMD concurrency, capped at
+    `per_host`, so it shrinks while the host is pushing back and grows
+    again as requests succeed.
+    """
+
+    def __init__(self, per_host):
+        """
+        Args:
+            per_host (int): Maximum concurrent requests per host.
+        """
+        self.per_host = per_host
+        self._conditions = {}
+        self._in_flight = {}
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """
+        Wait for a free slot on the host of a URL and hold it for the block.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Yields:
+            HostThrottle: The host's throttle, to report the outcome of the request to.
+        """
+        host = urlsplit(url).netloc
+        throttle = throttle_for(url, self.per_host)
+        if host not in self._conditions:
+            self._conditions[host] = asyncio.Condition()
+            self._in_flight[host] = 0
+        condition = self._conditions[host]
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight[host] < min(self.per_host, throttle.limit))
+            self._in_flight[host] += 1
+        try:
+            yield throttle
+        finally:
+            async with condition:
+                self._in_flight[host] -= 1
+                condition.notify_all()
+
+
+async def fetch_page(session, url, limiter, timeout, headers=None):
+    """
+    Download one page, retrying 429/5xx responses and connection errors.
+
+    Each attempt waits for the host's rate limit, and retries back off
+    exponentially with jitter or for the server's Retry-After.
+
+    Args:
+        session (aiohttp.ClientSession): The session to use.
+        url (str): The URL to download.
+        limiter (HostLimiter): The per-host concurrency limiter.
+        timeout (float): Timeout for the whole request in seconds.
+        headers (dict, optional): Extra request headers, e.g. for a conditional GET.
+
+    Returns:
+        tuple: (url, status code, body bytes, response headers). If the last
+        attempt failed with a timeout or connection error the status code is
+        None and the body and headers are empty.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        async with limiter.slot(url) as throttle:
+            await asyncio.sleep(throttle.reserve())
+            try:
+                with metrics.timer('fetch'):
+                    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        result = url, response.status, await response.read(), response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                result = url, None, b'', {}
+        metrics.inc('responses_total', status=str(result[1]) if result[1] is not None else 'error')
+        metrics.inc('response_bytes_total', len(result[2]))
+
+        status = result[1]
+        if status is not None and status not in RETRY_STATUSES:
+            throttle.on_success()
+            return result
+        if attempt == MAX_RETRIES:
+            if status is None:
+                print(f'Failed to retrieve {url}: {error!r}')
+            return result
+        retry_after = parse_retry_after(result[3].get('Retry-After'))
+        throttle.on_throttled(retry_after)
+        delay = retry_delay(attempt, retry_after)
+        reason = f'status {status}' if status is not None else repr(error)
+        print(f'Retrying {url} in {delay:.1f}s after {reason}')
+        await asyncio.sleep(delay)
+
+
+async def fetch_pages(urls, per_host=8, timeout=30, cache=None, kind=None, stats=None, max_in_flight=None,
+                      refresh=None):
+    """
+    Download pages concurrently and yield each one as soon as it finishes.
+
+    Connections are kept alive and reused, at most `per_host` per host, and
+    reuse statistics are printed when all pages are done. Pages found in
+    `cache` are yielded first without a request, and successful downloads
+    are stored in it. With a `kind`, expired pages that have a cached record
+    of that kind are revalidated with a conditional GET, and a 304 is yielded
+    with an empty body. URLs in `refresh` are known to have changed: they
+    skip the cache lookup and are downloaded in full.
+
+    At most `max_in_flight` pages are downloading or waiting to be yielded at
+    once. A new download starts only after a finished page has been taken by
+    the consumer, so a slow consumer pauses the downloads instead of letting
+    finished bodies pile up in memory.
+
+    Args:
+        urls (list): The URLs to download.
+        per_host (int, optional): Maximum concurrent requests per host. Defaults to 8.
+        timeout (float, optional): Timeout per request in seconds. Defaults to 30.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in.
+        kind (str, optional): The record kind the caller stores in the cache.
+        stats (dict, optional): Filled with per-host connection reuse counts and request latencies,
+            as recorded by `http_session.aiohttp_trace_config`.
+        max_in_flight (int, optional): Maximum pages downloaded but not yet yielded. Defaults to twice `per_host`.
+        refresh (set, optional): URLs to download even if they are cached.
+
+    Yields:
+        tuple: (url, status code, body bytes) in completion order.
+    """
+    refresh = refresh or set()
+    if cache is not None:
+        remaining = []
+        for url in urls:
+            body = cache.get(url) if url not in refresh else None
+            if body is None:
+                remaining.append(url)
+            else:
+                yield url, 200, body
+        urls = remaining
+
+    limiter = HostLimiter(per_host)
+    stats = {} if stats is None else stats
+    max_in_flight = max_in_flight or per_host * 2
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=per_host)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers={'Accept-Encoding': ACCEPT_ENCODING},
+        trace_configs=[aiohttp_trace_config(stats)],
+    ) as session:
+        queued = iter(urls)
+        in_flight = set()
+
+        def start_next():
+            url = next(queued, None)
+            if url is not None:
+                in_flight.add(asyncio.ensure_future(fetch_page(
+                    session, url, limiter, timeout,
+                    cache.conditional_headers(url, kind) if cache is not None and kind and url not in refresh else None,
+                )))
+
+        for _ in range(max_in_flight):
+            start_next()
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    in_flight.discard(task)
+                    url, status, body, headers = task.result()
+                    if cache is not None:
+                        if status == 304:
+                            cache.mark_not_modified(url)
+                        elif status == 200:
+                            cache.put(url, body, headers.get('ETag'), headers.get('Last-Modified'))
+                    yield url, status, body
+                    start_next()
+        finally:
+            for task in in_flight:
+                task.cancel()
+    log_stats(stats, 'Async HTTP')
+
+
+def fetch_all(urls, handle, per_host=8, timeout=30, cache=None, kind=None, stats=None, refresh=None):
+    """
+    Download pages concurrently and pass each finished page to a callback.
+
+    Args:
+        urls (list): The URLs to download.
+        handle (callable): Called as `handle(url, status, body)` for every page as it finishes.
+        per_host (int, optional): Maximum concurrent requests per host. Defaults to 8.
+        timeout (float, optional): Timeout per request in seconds. Defaults to 30.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in.
+        kind (str, optional): The record kind the caller stores in the cache, enabling revalidation.
+        stats (dict, optional): Filled with per-host connection reuse counts and request latencies.
+        refresh (set, optional): URLs to download even if they are cached.
+    """
+    async def run():
+        async for url, status, body in fetch_pages(urls, per_host, timeout, cache, kind, stats, refresh=refresh):
+            handle(url, status, body)
+
+    asyncio.run(run())
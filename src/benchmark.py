@@ -0,0 +1,735 @@
+"""
+Offline benchmarks for the scraper, run against a local HTTP server.
+
+The server serves synthetic search results, the search API and the sample
+listing page `oikotie_listing_page.html` for every listing path, with
+artificial latency, jitter and errors, so the scraper can be measured
+without touching the real site.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+import rate_limiter
+from async_fetcher import fetch_all
+from cards import CARD_SUMMARY_SELECTORS, join_summary, make_card
+from driver_manager import DriverManager
+from http_session import create_session, log_stats, session_stats
+from parsers import available_parsers
+from scrape_multiple_listings import (
+    CARD_SELECTOR, crawl, extract_property_details, fetch_listing_cards, fetch_listing_cards_parallel, parse_html_details,
+    parse_property_details, scrape_listing_page,
+)
+from search_api import API_PATH as SEARCH_API_PATH, PAGE_SIZE, TOKEN_META, fetch_listing_cards_http, parse_cards_response
+from sinks import SINKS, open_sink
+
+SAMPLE_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'oikotie_listing_page.html')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fixtures')
+SEARCH_API_FIXTURE = os.path.join(FIXTURES_DIR, 'search_api_cards.json')
+SEARCH_PAGE_FIXTURE = os.path.join(FIXTURES_DIR, 'search_results_page.html')
+SEARCH_PATH = '/myytavat-asunnot'
+RESULTS_DIR = '.benchmarks'
+
+# How analytics code loads each output format, to time it.
+READERS = {
+    'csv': lambda path: pd.read_csv(path, sep=';'),
+    'jsonl': lambda path: pd.read_json(path, lines=True),
+    'parquet': pd.read_parquet,
+    'sqlite': lambda path: pd.read_sql('SELECT * FROM properties', sqlite3.connect(path)),
+}
+
+
+class ReplayServer:
+    """
+    A local HTTP server that imitates the site: synthetic search result pages,
+    the JSON search API, and the sample listing page for every listing path.
+
+    Responses are delayed by `latency` plus up to `jitter` seconds, and a
+    fraction `error_rate` of requests get a 503 instead. Listing responses
+    carry an ETag and conditional requests matching it get a 304.
+    """
+
+    def __init__(self, latency=0.05, page_path=SAMPLE_PAGE, jitter=0.0, error_rate=0.0, listings=100):
+        """
+        Args:
+            latency (float, optional): Seconds to wait before every response. Defaults to 0.05.
+            page_path (str, optional): The HTML file to serve for listings. Defaults to the sample listing page.
+            jitter (float, optional): Maximum extra random delay per response in seconds. Defaults to 0.
+            error_rate (float, optional): Fraction of requests answered with a 503. Defaults to 0.
+            listings (int, optional): Number of listings the synthetic search returns. Defaults to 100.
+        """
+        with open(page_path, 'rb') as file:
+            page = file.read()
+        etag = '"' + hashlib.sha256(page).hexdigest()[:16] + '"'
+        self.listings = listings
+        self.requests = 0
+        self.errors = 0
+        counts_lock = threading.Lock()
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                time.sleep(latency + random.uniform(0, jitter))
+                failed = random.random() < error_rate
+                with counts_lock:
+                    replay.requests += 1
+                    replay.errors += failed
+                if failed:
+                    self.send_body(503, b'')
+                    return
+
+                url = urlsplit(self.path)
+                query = dict(parse_qsl(url.query))
+                if url.path == SEARCH_API_PATH:
+                    offset, limit = int(query.get('offset', 0)), int(query.get('limit', PAGE_SIZE))
+                    payload = {'cards': replay.api_cards(offset, limit), 'found': replay.listings}
+                    self.send_body(200, json.dumps(payload).encode('utf-8'), 'application/json')
+                elif url.path == SEARCH_PATH:
+                    page_index = int(query.get('pagination', 1))
+                    self.send_body(200, replay.search_page(page_index), 'text/html; charset=utf-8')
+                elif self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                else:
+                    self.send_body(200, page, 'text/html; charset=utf-8', {'ETag': etag})
+
+            def send_body(self, status, body, content_type='text/plain', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # Clients that give up on a request reset the connection; that is not a server fault.
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def search_url(self):
+        """
+        The URL of the synthetic search, accepted by both discovery modes.
+        """
+        return f'{self.base_url}{SEARCH_PATH}?cardType=100'
+
+    def listing_urls(self, count):
+        """
+        Return `count` distinct listing URLs served by this server.
+        """
+        return [f'{self.base_url}/myytavat-asunnot/helsinki/{index}' for index in range(count)]
+
+    def api_cards(self, offset, limit):
+        """
+        Return search API cards for listings `offset` to `offset + limit`.
+        """
+        urls = self.listing_urls(self.listings)[offset:offset + limit]
+        return [
+            {
+                'url': url,
+                'data': {
+                    'price': f'{200 + index} 000 €',
+                    'size': f'{30 + index % 60} m²',
+                    'rooms': 1 + index % 4,
+                    'roomConfiguration': f'{1 + index % 4}h+k',
+                },
+            }
+            for index, url in enumerate(urls, offset)
+        ]
+
+    def search_page(self, page_index):
+        """
+        Render a search results page with the card markup the Selenium discovery reads.
+        """
+        offset = (page_index - 1) * PAGE_SIZE
+        cards = ''.join(
+            f'<div class="ot-card-v2__info-container"><a class="ot-card-v2 link link--muted" href="{card["url"]}">'
+            f'<span class="ot-card-v2__price">{card["data"]["price"]}</span>'
+            f'<span class="ot-card-v2__size">{card["data"]["size"]}</span>'
+            f'<div class="ot-card-v2__rooms">{card["data"]["roomConfiguration"]}</div></a></div>'
+            for card in self.api_cards(offset, PAGE_SIZE)
+        )
+        meta = ''.join(f'<meta name="{name}" content="benchmark">' for name in TOKEN_META.values())
+        return f'<html><head>{meta}</head><body>{cards}</body></html>'.encode('utf-8')
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def bench_sequential_fetch(urls):
+    """
+    Download pages one at a time with blocking requests, as the original main() loop did.
+
+    Returns:
+        float: Elapsed seconds.
+    """
+    started = time.perf_counter()
+    for url in urls:
+        requests.get(url).content
+    return time.perf_counter() - started
+
+
+def bench_session_fetch(urls):
+    """
+    Download pages one at a time over a pooled keep-alive session.
+
+    Returns:
+        float: Elapsed seconds.
+    """
+    session = create_session()
+    started = time.perf_counter()
+    for url in urls:
+        session.get(url).content
+    elapsed = time.perf_counter() - started
+    log_stats(session_stats(session), 'Pooled session')
+    return elapsed
+
+
+def bench_async_fetch(urls, per_host):
+    """
+    Download pages with the asyncio fetcher.
+
+    Returns:
+        float: Elapsed seconds.
+    """
+    started = time.perf_counter()
+    fetch_all(urls, lambda url, status, body: None, per_host=per_host)
+    return time.perf_counter() - started
+
+
+def check_parser_conformance(content):
+    """
+    Check that every installed parser backend extracts identical fields from a page,
+    with both full and partial parsing.
+
+    Full parsing with html.parser is the reference.
+
+    Args:
+        content (bytes): The HTML of a listing page.
+
+    Raises:
+        AssertionError: If any backend or mode disagrees with the reference on any field.
+    """
+    expected = parse_html_details(content, 'html.parser', partial=False)
+    for name in available_parsers():
+        for partial in (False, True):
+            details = parse_html_details(content, name, partial)
+            mismatched = [key for key in expected if details.get(key) != expected[key]]
+            mode = 'partial' if partial else 'full'
+            if mismatched:
+                raise AssertionError(f'{name} ({mode}) disagrees with html.parser on {", ".join(mismatched)}')
+            print(f'{name} ({mode}): all {len(expected)} fields match html.parser')
+
+
+# Fields only found in the page's info tables, which must be filled from the sample page.
+INFO_TABLE_FIELDS = ('Energy Class', 'Plot Size', 'Total Floors')
+
+
+def check_info_table_fields(content):
+    """
+    Check that fields only listed in a page's info tables are read from it.
+
+    Args:
+        content (bytes): The HTML of a listing page.
+
+    Raises:
+        AssertionError: If any of `INFO_TABLE_FIELDS` is missing.
+    """
+    details = parse_property_details(content).to_dict()
+    missing = [field for field in INFO_TABLE_FIELDS if details.get(field) is None]
+    if missing:
+        raise AssertionError(f'No value read for {", ".join(missing)}')
+    print('Info tables: ' + ', '.join(f'{field}={details[field]}' for field in INFO_TABLE_FIELDS))
+
+
+def page_cards(content):
+    """
+    Collect listing cards from search results page HTML the way the browser's EXTRACT_CARDS_SCRIPT does.
+
+    Args:
+        content (bytes): The HTML of a search results page.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}).
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    cards = []
+    for tag in soup.select(CARD_SELECTOR):
+        if tag.get('href'):
+            parts = [tag.select_one(selector) for selector in CARD_SUMMARY_SELECTORS]
+            cards.append(make_card(tag['href'], join_summary(part.get_text() if part else '' for part in parts)))
+    return cards
+
+
+def check_discovery_conformance(payload, content):
+    """
+    Check that the search API and the Selenium card extraction find the same listings with the same summaries.
+
+    Args:
+        payload (dict): A decoded search API response.
+        content (bytes): The HTML of the search results page for the same search.
+
+    Raises:
+        AssertionError: If the two find different listing URLs or summaries.
+    """
+    api_cards, _ = parse_cards_response(payload)
+    browser_cards = page_cards(content)
+    api_urls = {card['url'] for card in api_cards}
+    browser_urls = {card['url'] for card in browser_cards}
+    if api_urls != browser_urls:
+        raise AssertionError(
+            f'search API and search page disagree: {len(api_urls - browser_urls)} only in the API, '
+            f'{len(browser_urls - api_urls)} only on the page'
+        )
+    api_summaries = {card['url']: card['summary'] for card in api_cards}
+    differing = [card['url'] for card in browser_cards if card['summary'] != api_summaries[card['url']]]
+    if differing:
+        raise AssertionError(f'search API and search page summaries differ for {len(differing)} listings, e.g. {differing[0]}')
+    print(f'Search API and search page: the same {len(api_urls)} listings and summaries')
+
+
+def measure(function, repeat):
+    """
+    Time a function and measure the peak memory allocated by one call.
+
+    Args:
+        function (callable): Called without arguments.
+        repeat (int): Number of timed calls.
+
+    Returns:
+        tuple: (mean seconds per call, peak bytes allocated during one call).
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    seconds = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def bench_parsers(content, repeat):
+    """
+    Time the details-grid and info-table walk on every installed parser backend with full and
+    partial parsing, and the full extraction (grid walk plus JSON-LD coordinates)
+    on the default backend.
+
+    Args:
+        content (bytes): The HTML of a listing page.
+        repeat (int): Number of parses per backend.
+
+    Returns:
+        dict: Label -> (mean seconds per page, peak bytes per page).
+    """
+    results = {}
+    for name in available_parsers():
+        for partial in (False, True):
+            label = f'{name} ({"partial" if partial else "full"})'
+            results[label] = measure(lambda: parse_html_details(content, name, partial), repeat)
+    results['html + json-ld coordinates'] = measure(lambda: parse_property_details(content), repeat)
+    return results
+
+
+def bench_browser(search_url, pages, block_resources):
+    """
+    Load search result pages in Selenium and time page load and the scroll loop.
+
+    Args:
+        search_url (str): The search URL; pages are selected with '&pagination=N'.
+        pages (int): Number of result pages to load.
+        block_resources (bool): Use the resource-blocking browser profile.
+
+    Returns:
+        dict: Mean 'page_load' and 'scroll' seconds, mean 'bytes' downloaded and 'cards' found, per page.
+    """
+    scroll = []
+    cards = 0
+    with DriverManager(block_resources=block_resources) as manager:
+        for page_index in range(1, pages + 1):
+            driver = manager.get(f'{search_url}&pagination={page_index}')
+            started = time.perf_counter()
+            cards += len(scrape_listing_page(driver))
+            scroll.append(time.perf_counter() - started)
+        manager.quit()
+    timings = manager.timings
+    return {
+        'page_load': sum(t['navigation'] for t in timings) / pages,
+        'scroll': sum(scroll) / pages,
+        'bytes': sum(t['bytes'] for t in timings) / pages,
+        'cards': cards / pages,
+    }
+
+
+def bench_discovery(search_url, browsers):
+    """
+    Discover a search's listings with one browser and with a pool of browsers.
+
+    Args:
+        search_url (str): The search URL; pages are selected with '&pagination=N'.
+        browsers (int): Browsers in the pool.
+
+    Returns:
+        dict: {'sequential', 'parallel'}, each with 'seconds' and 'urls' (the listing URLs in page order).
+    """
+    results = {}
+    for label, discover in (
+        ('sequential', fetch_listing_cards),
+        ('parallel', partial(fetch_listing_cards_parallel, pool_size=browsers)),
+    ):
+        started = time.perf_counter()
+        cards = discover(search_url)
+        results[label] = {'seconds': time.perf_counter() - started, 'urls': [card['url'] for card in cards]}
+    return results
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """
+    Return nearest-rank percentiles of a list of numbers.
+
+    Args:
+        values (list): The numbers.
+        points (tuple, optional): Percentiles to return. Defaults to (50, 95, 99).
+
+    Returns:
+        dict: e.g. {'p50': ..., 'p95': ..., 'p99': ...}; None values if `values` is empty.
+    """
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        rank = max(1, -(-point * len(ordered) // 100))
+        result[f'p{point}'] = ordered[rank - 1] if ordered else None
+    return result
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process and of its finished child processes.
+
+    Returns:
+        dict: {'self', 'children'} in bytes, or None values where the platform cannot tell.
+    """
+    if resource is None:
+        return {'self': None, 'children': None}
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def stage_result(seconds, items, **extra):
+    """
+    Summarise one benchmark stage.
+    """
+    return {'seconds': seconds, 'items': items, 'per_second': items / seconds if seconds else None, **extra}
+
+
+def bench_crawl(server, per_host, workers, directory):
+    """
+    Run each crawl stage on its own, then the whole crawl end to end.
+
+    The stages are discovery through the search API, downloading every
+    listing page, parsing the pages in a process pool, and writing the
+    records in each output format, with the file size and the time pandas
+    takes to load it. The end-to-end run is `scrape_multiple_listings.crawl`
+    with a fresh cache, so every page is downloaded again.
+
+    Args:
+        server (ReplayServer): The running server.
+        per_host (int): Concurrent requests per host.
+        workers (int): Parser processes.
+        directory (str): Scratch directory for output and cache files.
+
+    Returns:
+        dict: Stage name -> {'seconds', 'items', 'per_second', ...}.
+    """
+    stages = {}
+
+    started = time.perf_counter()
+    cards = fetch_listing_cards_http(server.search_url)
+    stages['discovery'] = stage_result(time.perf_counter() - started, len(cards))
+
+    urls = []
+    bodies = []
+    statuses = {}
+    stats = {}
+
+    def handle(url, status, body):
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 200:
+            urls.append(url)
+            bodies.append(body)
+
+    started = time.perf_counter()
+    fetch_all([card['url'] for card in cards], handle, per_host=per_host, stats=stats)
+    latencies = [seconds for host in stats.values() for seconds in host['latencies']]
+    stages['fetch'] = stage_result(
+        time.perf_counter() - started,
+        len(bodies),
+        requests=sum(host['requests'] for host in stats.values()),
+        statuses=statuses,
+        latency=percentiles(latencies),
+    )
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        records = list(executor.map(parse_property_details, bodies, chunksize=4))
+    for url, record in zip(urls, records):
+        record.url = url
+    stages['parse'] = stage_result(time.perf_counter() - started, len(records))
+
+    for format in SINKS:
+        path = os.path.join(directory, f'stages.{format}')
+        started = time.perf_counter()
+        try:
+            with open_sink(path, format) as sink:
+                for record in records:
+                    sink.write(record)
+        except ImportError as e:
+            print(f'Skipping {format} output: {e}')
+            continue
+        seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        READERS[format](path)
+        stages[f'write_{format}'] = stage_result(
+            seconds, sink.count, bytes=os.path.getsize(path), load_seconds=time.perf_counter() - started
+        )
+
+    started = time.perf_counter()
+    written = crawl(
+        server.search_url,
+        os.path.join(directory, 'crawl.csv'),
+        per_host=per_host,
+        workers=workers,
+        cache_dir=os.path.join(directory, 'cache'),
+    )
+    stages['end_to_end'] = stage_result(time.perf_counter() - started, written)
+    return stages
+
+
+def save_results(results, path=None):
+    """
+    Save benchmark results as JSON.
+
+    Args:
+        results (dict): The results.
+        path (str, optional): The file to write. Defaults to a timestamped file in '.benchmarks'.
+
+    Returns:
+        str: The path written.
+    """
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"crawl-{results['started'].replace(':', '')}.json")
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    return path
+
+
+def run_fetch(args):
+    """
+    Run the fetch benchmarks and print the results.
+    """
+    rate_limiter.configure(rate=args.rate)
+    with ReplayServer(latency=args.latency) as server:
+        urls = server.listing_urls(args.pages)
+        sequential = bench_sequential_fetch(urls)
+        pooled = bench_session_fetch(urls)
+        concurrent = bench_async_fetch(urls, args.per_host)
+
+    print(f'Sequential fetch: {args.pages / sequential:.1f} pages/s ({sequential:.2f}s)')
+    print(f'Pooled session fetch: {args.pages / pooled:.1f} pages/s ({pooled:.2f}s)')
+    print(f'Async fetch (per_host={args.per_host}): {args.pages / concurrent:.1f} pages/s ({concurrent:.2f}s)')
+
+
+def run_parse(args):
+    """
+    Check discovery and parser conformance on the fixtures, then run the per-backend parse benchmark
+    and print the results.
+    """
+    with open(SAMPLE_PAGE, 'rb') as file:
+        content = file.read()
+    with open(SEARCH_API_FIXTURE, encoding='utf-8') as file:
+        payload = json.load(file)
+    with open(SEARCH_PAGE_FIXTURE, 'rb') as file:
+        search_page = file.read()
+
+    check_discovery_conformance(payload, search_page)
+    check_parser_conformance(content)
+    check_info_table_fields(content)
+    _, sources = extract_property_details(content)
+    print('Field sources: ' + ', '.join(f'{field}={source}' for field, source in sources.items()))
+    for label, (seconds, peak) in bench_parsers(content, args.repeat).items():
+        print(f'{label}: {seconds * 1000:.1f} ms/page, peak {peak / 1024:.0f} KiB')
+
+
+def run_browser(args):
+    """
+    Compare the full and the resource-blocking browser profiles on search result pages and print the results.
+    """
+    with ReplayServer(latency=args.latency) as server:
+        search_url = args.url or server.search_url
+        for label, block_resources in (('Full browser', False), ('Blocking browser', True)):
+            result = bench_browser(search_url, args.pages, block_resources)
+            print(
+                f"{label}: page load {result['page_load']:.2f}s, scroll {result['scroll']:.2f}s, "
+                f"{result['bytes'] / 1024:.0f} KiB, {result['cards']:.0f} cards per page"
+            )
+
+
+def run_discovery(args):
+    """
+    Compare sequential and pooled Selenium discovery on the replay server and print the results.
+    """
+    with ReplayServer(latency=args.latency, listings=args.listings) as server:
+        results = bench_discovery(server.search_url, args.browsers)
+    for label, result in results.items():
+        print(f"{label.capitalize()} discovery: {len(result['urls'])} listings in {result['seconds']:.2f}s")
+    same = results['sequential']['urls'] == results['parallel']['urls']
+    print(f"Parallel discovery with {args.browsers} browsers {'matches' if same else 'DOES NOT match'} the sequential result")
+
+
+def run_crawl(args):
+    """
+    Run the crawl benchmark against a replay server, print a summary and save the results as JSON.
+    """
+    rate_limiter.configure(rate=args.rate)
+    workers = args.workers or os.cpu_count() or 1
+    results = {
+        'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'listings': args.listings,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate,
+            'per_host': args.per_host,
+            'workers': workers,
+            'rate': args.rate,
+        },
+    }
+    server = ReplayServer(args.latency, jitter=args.jitter, error_rate=args.error_rate, listings=args.listings)
+    with server, tempfile.TemporaryDirectory() as directory:
+        results['stages'] = bench_crawl(server, args.per_host, workers, directory)
+    results['server'] = {'requests': server.requests, 'errors': server.errors}
+    results['peak_rss'] = peak_rss()
+
+    for name, stage in results['stages'].items():
+        line = f"{name}: {stage['items']} items in {stage['seconds']:.2f}s ({stage['per_second'] or 0:.1f}/s)"
+        if 'bytes' in stage:
+            line += f", {stage['bytes'] / 1024:.0f} KiB, loads in {stage['load_seconds'] * 1000:.1f} ms"
+        if 'latency' in stage and stage['latency']['p50'] is not None:
+            line += ', latency ' + ', '.join(f'{point} {seconds * 1000:.0f} ms' for point, seconds in stage['latency'].items())
+        print(line)
+    print(f"Server: {server.requests} requests, {server.errors} injected errors")
+    rss = results['peak_rss']
+    if rss['self'] is not None:
+        print(f"Peak RSS: {rss['self'] / 2 ** 20:.0f} MiB (parser processes {rss['children'] / 2 ** 20:.0f} MiB)")
+    print(f'Results saved to {save_results(results, args.output)}')
+
+
+def main():
+    """
+    Run the selected benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    fetch = subparsers.add_parser('fetch', help='Compare page download strategies.')
+    fetch.add_argument('--pages', type=int, default=100, help='Number of listing pages to fetch.')
+    fetch.add_argument('--latency', type=float, default=0.05, help='Server latency per response in seconds.')
+    fetch.add_argument('--per-host', type=int, default=8, help='Concurrent requests for the async fetcher.')
+    fetch.add_argument('--rate', type=float, default=None, help='Requests per second per host (default: unlimited).')
+    fetch.set_defaults(run=run_fetch)
+
+    parse = subparsers.add_parser('parse', help='Check discovery and parsers on the fixtures, and time the parser backends.')
+    parse.add_argument('--repeat', type=int, default=20, help='Parses per backend.')
+    parse.set_defaults(run=run_parse)
+
+    browser = subparsers.add_parser('browser', help='Compare Selenium discovery with and without resource blocking.')
+    browser.add_argument('--pages', type=int, default=3, help='Search result pages to load with each profile.')
+    browser.add_argument('--url', help='Search URL to load instead of the replay server, e.g. a live search.')
+    browser.add_argument('--latency', type=float, default=0.05, help='Server latency per response in seconds.')
+    browser.set_defaults(run=run_browser)
+
+    discovery = subparsers.add_parser('discovery', help='Compare Selenium discovery with one browser and with a pool.')
+    discovery.add_argument(
+        '--listings', type=int, default=100,
+        help='Listings in the synthetic search; keep the last page under 10 cards so sequential discovery stops there.',
+    )
+    discovery.add_argument('--browsers', type=int, default=4, help='Browsers in the pool.')
+    discovery.add_argument('--latency', type=float, default=0.2, help='Server latency per response in seconds.')
+    discovery.set_defaults(run=run_discovery)
+
+    crawl_command = subparsers.add_parser('crawl', help='Time discovery, fetch, parse and write, and save the results as JSON.')
+    crawl_command.add_argument('--listings', type=int, default=200, help='Listings in the synthetic search.')
+    crawl_command.add_argument('--latency', type=float, default=0.05, help='Server latency per response in seconds.')
+    crawl_command.add_argument('--jitter', type=float, default=0.02, help='Maximum extra random latency in seconds.')
+    crawl_command.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503.')
+    crawl_command.add_argument('--per-host', type=int, default=8, help='Concurrent requests per host.')
+    crawl_command.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count).')
+    crawl_command.add_argument('--rate', type=float, default=None, help='Requests per second per host (default: unlimited).')
+    crawl_command.add_argument('--output', help=f'JSON results file (default: a timestamped file in {RESULTS_DIR}).')
+    crawl_command.set_defaults(run=run_crawl)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Search result cards: a listing's URL, ID and the summary shown on the search page.
+"""
+
+import re
+
+CARD_ID_PATTERN = re.compile(r'/(\d+)/?$')
+
+# Elements of a search page card the summary is read from: price, size and room layout.
+CARD_SUMMARY_SELECTORS = ('.ot-card-v2__price', '.ot-card-v2__size', '.ot-card-v2__rooms')
+
+
+def card_id(url):
+    """
+    Extract the listing ID from a listing URL.
+
+    Args:
+        url (str): A listing URL, e.g. 'https://asunnot.oikotie.fi/myytavat-asunnot/helsinki/21460522'.
+
+    Returns:
+        str: The listing ID, or the URL itself if it does not end in an ID.
+    """
+    match = CARD_ID_PATTERN.search(url)
+    return match.group(1) if match else url
+
+
+def join_summary(parts):
+    """
+    Join a card's price, size and room layout into its summary.
+
+    Runs of whitespace, including non-breaking spaces, collapse to one space so
+    that the search API and the search page give the same summary.
+
+    Args:
+        parts (iterable): The price, size and room layout, as shown on the card.
+
+    Returns:
+        str: e.g. '435 000 € | 52,5 m² | 2h+avok+kph'.
+    """
+    return ' | '.join(' '.join(str(part).split()) for part in parts)
+
+
+def make_card(url, summary=''):
+    """
+    Build a card dictionary for a listing found during discovery.
+
+    Args:
+        url (str): The listing URL.
+        summary (str, optional): The card's visible summary, as built by `join_summary`. Defaults to ''.
+
+    Returns:
+        dict: {'id', 'url', 'summary'}.
+    """
+    return {'id': card_id(url), 'url': url, 'summary': summary}
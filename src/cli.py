@@ -0,0 +1,204 @@
+"""
+Non-interactive command-line entry point for both scrapers, for cron jobs and job runners.
+
+Examples, run from the `src` directory:
+
+    python cli.py search URL [URL ...] --output properties.csv
+    python cli.py search --url-file searches.txt --format jsonl --mode selenium --browsers 4
+    python cli.py listing URL --output property_details.csv
+    python cli.py search --config nightly.json
+
+Every option can also be set in a JSON config file whose keys are the long
+option names with underscores, e.g. {"urls": [...], "per_host": 4}.
+Options given on the command line take precedence over the config file.
+"""
+
+import argparse
+import json
+import sys
+
+import metrics
+import rate_limiter
+from parsers import PARSERS
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from scrape_multiple_listings import cache_path, crawl
+from scrape_single_listing import fetch_property_details, save_records
+from sinks import SINKS, open_sink
+
+# Formats `save_records` can write single listings in; the SQLite store is keyed by search listings.
+LISTING_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Output file names without --output; the format name is added as the extension.
+DEFAULT_OUTPUTS = {'search': 'properties', 'listing': 'property_details'}
+
+
+def read_url_file(path):
+    """
+    Read URLs from a file, one per line; blank lines and lines starting with '#' are skipped.
+
+    Args:
+        path (str): The file to read, or '-' for standard input.
+
+    Returns:
+        list: The URLs.
+    """
+    if path == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(path, encoding='utf-8') as file:
+            lines = file.readlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+
+def load_config(path):
+    """
+    Load options from a JSON config file.
+
+    Args:
+        path (str): The config file.
+
+    Returns:
+        dict: Option name -> value, with dashes in names replaced by underscores.
+    """
+    with open(path, encoding='utf-8') as file:
+        config = json.load(file)
+    if not isinstance(config, dict):
+        raise ValueError(f'{path} must contain a JSON object')
+    return {key.replace('-', '_'): value for key, value in config.items()}
+
+
+def run_search(args, urls):
+    """
+    Crawl every search URL into one output file.
+    """
+    with open_sink(args.output, args.format) as sink:
+        for url in urls:
+            print(f'Crawling {url}')
+            crawl(
+                url,
+                sink=sink,
+                mode=args.mode,
+                per_host=args.per_host,
+                workers=args.workers,
+                parser=args.parser,
+                cache_dir=args.cache_dir,
+                browsers=args.browsers,
+            )
+
+
+def run_listing(args, urls):
+    """
+    Scrape every listing URL into one output file.
+    """
+    with ResponseCache(cache_path(args.cache_dir, DEFAULT_CACHE_PATH)) as cache:
+        records = [fetch_property_details(url, args.parser, cache) for url in urls]
+    records = [record for record in records if record]
+    if records:
+        save_records(records, args.output, args.format)
+    else:
+        print('No properties found.')
+
+
+def build_parser():
+    """
+    Build the argument parser.
+
+    Returns:
+        tuple: (argparse.ArgumentParser, dict of command name -> subparser).
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('urls', nargs='*', metavar='URL', help='URLs to scrape.')
+    common.add_argument('--url-file', help="File with one URL per line, or '-' for standard input.")
+    common.add_argument(
+        '-o', '--output',
+        help='Output file (default: properties.FORMAT for search, property_details.FORMAT for listing).',
+    )
+    common.add_argument('--format', choices=sorted(SINKS), default='csv', help='Output format (default: csv).')
+    common.add_argument('--cache-dir', help='Directory for the response cache and crawl state (default: .scrape_cache).')
+    common.add_argument('--parser', choices=sorted(PARSERS), help='HTML parser backend (default: fastest installed).')
+    common.add_argument(
+        '--rate', type=float, default=rate_limiter.DEFAULT_RATE, help='Requests per second per host (default: 10).'
+    )
+    common.add_argument('--metrics', help="Save a metrics snapshot at the end: Prometheus text for '.prom', else JSON.")
+    common.add_argument('--metrics-port', type=int, help='Serve live metrics on this port at /metrics during the run.')
+    common.add_argument('--config', help='JSON file with default values for these options.')
+
+    parser = argparse.ArgumentParser(description='Scrape property listings without prompting.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search = subparsers.add_parser('search', parents=[common], help='Crawl search results and scrape every listing.')
+    search.add_argument('--mode', choices=['http', 'selenium'], default='http', help='Listing discovery (default: http).')
+    search.add_argument(
+        '--browsers', type=int, default=1, help='Browsers loading results pages in parallel with Selenium (default: 1).'
+    )
+    search.add_argument('--per-host', type=int, default=8, help='Concurrent requests per host (default: 8).')
+    search.add_argument('--workers', type=int, help='Parser processes, or 0 to parse in-process (default: CPU count).')
+    search.set_defaults(run=run_search)
+
+    listing = subparsers.add_parser('listing', parents=[common], help='Scrape individual listing pages.')
+    listing.set_defaults(run=run_listing)
+
+    return parser, {'search': search, 'listing': listing}
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line, filling unset options from the config file if one is given.
+
+    Without an output file, the command's default name is used with the format
+    as its extension, e.g. 'properties.sqlite'.
+
+    Args:
+        argv (list, optional): The arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        argparse.Namespace: The options.
+    """
+    parser, commands = build_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        try:
+            config = load_config(args.config)
+        except (OSError, ValueError) as e:
+            parser.error(f'cannot read config file: {e}')
+        unknown = sorted(set(config) - (set(vars(args)) - {'run', 'command'}))
+        if unknown:
+            parser.error(f"unknown option(s) in {args.config}: {', '.join(unknown)}")
+        commands[args.command].set_defaults(**config)
+        args = parser.parse_args(argv)
+    if args.command == 'listing' and args.format not in LISTING_FORMATS:
+        parser.error(f"listing: --format must be one of: {', '.join(LISTING_FORMATS)}")
+    if args.output is None:
+        args.output = f'{DEFAULT_OUTPUTS[args.command]}.{args.format}'
+    return args
+
+
+def main(argv=None):
+    """
+    Run the scraper selected on the command line.
+
+    Args:
+        argv (list, optional): The arguments. Defaults to `sys.argv[1:]`.
+    """
+    args = parse_args(argv)
+    urls = list(args.urls)
+    if args.url_file:
+        urls += read_url_file(args.url_file)
+    if not urls:
+        sys.exit('No URLs given: pass them as arguments, with --url-file or in the config file.')
+
+    rate_limiter.configure(rate=args.rate)
+    registry = metrics.get_registry()
+    server = registry.serve(args.metrics_port) if args.metrics_port is not None else None
+    try:
+        args.run(args, urls)
+    finally:
+        registry.report()
+        if args.metrics:
+            registry.write(args.metrics)
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Append-only JSONL journal that lets an interrupted crawl resume where it stopped.
+
+The journal records the cards found by discovery and every completed record
+as it is scraped, each line flushed and fsynced. A restarted crawl of the
+same search reads it back, skips discovery and fetches only the listings
+that were not finished. Each search has its own journal file, so a run over
+several searches can resume every one of them.
+"""
+
+import hashlib
+import json
+import os
+
+DEFAULT_JOURNAL_DIR = os.path.join('.scrape_cache', 'journals')
+
+
+def journal_path(search, directory=DEFAULT_JOURNAL_DIR):
+    """
+    Return the journal file of a search.
+
+    Args:
+        search (str): The search URL.
+        directory (str, optional): The directory holding the journals. Defaults to '.scrape_cache/journals'.
+
+    Returns:
+        str: The path, named after a hash of the search URL.
+    """
+    return os.path.join(directory, hashlib.sha1(search.encode('utf-8')).hexdigest()[:16] + '.jsonl')
+
+
+class CrawlJournal:
+    """
+    The journal of the last, possibly unfinished, crawl of one search.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The JSONL file to use, usually from `journal_path`.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.search = None
+        self.cards = None
+        self.completed = {}
+        self.finished = False
+        self._file = None
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _load(self):
+        """
+        Read the existing journal, ignoring a partly written last line.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['event'] == 'discovered':
+                    self.search = entry['search']
+                    self.cards = entry['cards']
+                    self.completed = {}
+                    self.finished = False
+                elif entry['event'] == 'completed':
+                    self.completed[entry['url']] = entry['record']
+                elif entry['event'] == 'finished':
+                    self.finished = True
+
+    def _append(self, entry, mode='a'):
+        if self._file is None or mode == 'w':
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.path, mode, encoding='utf-8')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def resume(self, search):
+        """
+        Return the discovered cards of an unfinished crawl of this search.
+
+        Args:
+            search (str): The search URL being crawled.
+
+        Returns:
+            list | None: The cards, or None if there is no unfinished crawl of this search.
+        """
+        if self.cards is None or self.finished or self.search != search:
+            return None
+        print(f'Resuming crawl: {len(self.completed)} of {len(self.cards)} listings already done')
+        return self.cards
+
+    def start(self, search, cards):
+        """
+        Begin a new journal for a crawl, replacing any previous one.
+
+        Args:
+            search (str): The search URL being crawled.
+            cards (list): The cards found by discovery.
+        """
+        self.search = search
+        self.cards = cards
+        self.completed = {}
+        self.finished = False
+        self._append({'event': 'discovered', 'search': search, 'cards': cards}, mode='w')
+
+    def record(self, url, record):
+        """
+        Record a completed listing.
+
+        Args:
+            url (str): The listing URL.
+            record (dict): The scraped property details.
+        """
+        self.completed[url] = record
+        self._append({'event': 'completed', 'url': url, 'record': record})
+
+    def finish(self):
+        """
+        Mark the crawl as complete so the next run starts from discovery.
+        """
+        self.finished = True
+        self._append({'event': 'finished'})
+
+    def close(self):
+        """
+        Close the journal file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
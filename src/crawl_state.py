@@ -0,0 +1,159 @@
+"""
+State kept between crawls so that only new or changed listings are fetched.
+
+For every search the store remembers each listing card seen, a fingerprint
+of its search-card summary (price, size, room layout) and the record last scraped
+for it. A crawl fetches detail pages only for new cards and cards whose
+fingerprint changed; unchanged cards reuse their stored record, and cards
+that no longer appear in the search are marked as delisted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_STATE_PATH = os.path.join('.scrape_cache', 'crawl_state.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    search TEXT NOT NULL,
+    id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fingerprint TEXT,
+    record TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    delisted_at REAL,
+    PRIMARY KEY (search, id)
+);
+"""
+
+
+def fingerprint(card):
+    """
+    Hash the visible summary of a search card.
+
+    Args:
+        card (dict): A card dictionary with a 'summary'.
+
+    Returns:
+        str | None: The fingerprint, or None if the card has no summary.
+    """
+    if not card.get('summary'):
+        return None
+    return hashlib.sha1(card['summary'].encode('utf-8')).hexdigest()
+
+
+class CrawlState:
+    """
+    SQLite store of the listing cards seen in previous crawls of each search.
+    """
+
+    def __init__(self, search, path=DEFAULT_STATE_PATH):
+        """
+        Args:
+            search (str): The search URL this crawl belongs to.
+            path (str, optional): The SQLite file to use. Defaults to '.scrape_cache/crawl_state.sqlite'.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.search = search
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+        self._pending = {}
+        self.changed = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def plan(self, cards):
+        """
+        Decide which cards need their detail page fetched.
+
+        A card is fetched if it is new, if its fingerprint changed or is
+        unknown, or if no record was stored for it. Cards missing from `cards`
+        that were listed before are marked as delisted. The URLs of cards whose
+        fingerprint differs from the stored one are collected in `changed`, so
+        that their pages are not served from a response cache.
+
+        Args:
+            cards (list): Card dictionaries from discovery.
+
+        Returns:
+            tuple: (list of cards to fetch, list of (url, stored record) pairs for unchanged cards).
+        """
+        now = time.time()
+        known = {}
+        listed = set()
+        for listing_id, stored_fingerprint, stored_record, delisted_at in self._connection.execute(
+            'SELECT id, fingerprint, record, delisted_at FROM listings WHERE search = ?', (self.search,)
+        ):
+            known[listing_id] = (stored_fingerprint, stored_record)
+            if delisted_at is None:
+                listed.add(listing_id)
+
+        to_fetch = []
+        unchanged = []
+        seen = set()
+        for card in cards:
+            if card['id'] in seen:
+                continue
+            seen.add(card['id'])
+            card_fingerprint = fingerprint(card)
+            stored_fingerprint, stored_record = known.get(card['id'], (None, None))
+            if card_fingerprint is not None and card_fingerprint == stored_fingerprint and stored_record:
+                unchanged.append((card['url'], json.loads(stored_record)))
+            else:
+                to_fetch.append(card)
+                self._pending[card['url']] = card
+                if stored_fingerprint is not None and card_fingerprint != stored_fingerprint:
+                    self.changed.add(card['url'])
+            self._connection.execute(
+                'INSERT INTO listings (search, id, url, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (search, id) DO UPDATE SET url = excluded.url, last_seen = excluded.last_seen, '
+                'delisted_at = NULL',
+                (self.search, card['id'], card['url'], now, now),
+            )
+
+        delisted = [card_id for card_id in listed if card_id not in seen]
+        self._connection.executemany(
+            'UPDATE listings SET delisted_at = ? WHERE search = ? AND id = ?',
+            [(now, self.search, card_id) for card_id in delisted],
+        )
+        self._connection.commit()
+
+        print(
+            f'Crawl state: {len(to_fetch)} new or changed, {len(unchanged)} unchanged, '
+            f'{len(delisted)} no longer listed'
+        )
+        return to_fetch, unchanged
+
+    def update(self, url, record):
+        """
+        Store the record scraped for a card returned by `plan`, with its current fingerprint.
+
+        Args:
+            url (str): The listing URL.
+            record (dict): The scraped property details.
+        """
+        card = self._pending.pop(url, None)
+        if card is None:
+            return
+        self._connection.execute(
+            'UPDATE listings SET fingerprint = ?, record = ? WHERE search = ? AND id = ?',
+            (fingerprint(card), json.dumps(record), self.search, card['id']),
+        )
+        self._connection.commit()
+
+    def close(self):
+        """
+        Close the state file.
+        """
+        self._connection.close()
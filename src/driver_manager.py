@@ -0,0 +1,280 @@
+"""
+Lifecycle management for the Selenium browser used during listing discovery.
+
+Discovery only needs the listing cards, so by default the browser runs
+headless and does not download images, fonts, stylesheets or the ad,
+consent and analytics scripts around the cards.
+"""
+
+import json
+import threading
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+import metrics
+
+# URL patterns the discovery browser does not load, in Chrome's
+# Network.setBlockedURLs syntax: '*' matches any characters.
+BLOCKED_URL_PATTERNS = (
+    # Images and fonts.
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # Stylesheets; the cards are found by class name, not by layout.
+    '*.css',
+    # Ads: the AppNexus loader and the ad networks it pulls in.
+    '*adnxs.com*', '*/ast.js*', '*doubleclick.net*', '*googlesyndication.com*',
+    # Consent management.
+    '*sp-prod.net*', '*privacy-mgmt.com*', '*consensu.org*', '*cookielaw.org*',
+    # Analytics and the card-visit-count beacons.
+    '*googletagmanager.com*', '*google-analytics.com*', '*card-visit-count*',
+)
+
+
+def create_chrome_driver(headless=True, block_resources=False):
+    """
+    Start a new Chrome WebDriver.
+
+    Network events are logged so `transferred_bytes` can tell how much each
+    page downloaded.
+
+    Args:
+        headless (bool, optional): Run the browser without a window. Defaults to True.
+        block_resources (bool, optional): Skip images and requests matching `BLOCKED_URL_PATTERNS`.
+            Defaults to False.
+
+    Returns:
+        webdriver.Chrome: The started driver.
+    """
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless=new')
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if block_resources:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    driver = webdriver.Chrome(options=options)
+    if block_resources:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(BLOCKED_URL_PATTERNS)})
+    return driver
+
+
+def transferred_bytes(driver):
+    """
+    Return the bytes a driver downloaded since the previous call, from its performance log.
+
+    Args:
+        driver (webdriver.Chrome): A driver started by `create_chrome_driver`.
+
+    Returns:
+        int | None: Bytes received over the network, or None if the driver keeps no performance log.
+    """
+    try:
+        entries = driver.get_log('performance')
+    except WebDriverException:
+        return None
+    total = 0
+    for entry in entries:
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            total += message['params'].get('encodedDataLength', 0)
+    return total
+
+
+class DriverManager:
+    """
+    Keep one browser alive for a whole crawl and recycle it only when needed.
+
+    The driver is started lazily on the first page, reused for every following
+    page and restarted after `max_pages` pages or when a page crashes it.
+    Startup and navigation time and the bytes downloaded are recorded for
+    every page.
+    """
+
+    def __init__(self, max_pages=50, headless=True, driver_factory=None, block_resources=True):
+        """
+        Args:
+            max_pages (int, optional): Pages to load before the driver is recycled. Defaults to 50.
+            headless (bool, optional): Run the browser without a window. Defaults to True.
+            driver_factory (callable, optional): Returns a new driver. Defaults to a Chrome driver.
+            block_resources (bool, optional): Block images, fonts, stylesheets, ads and analytics
+                in the default Chrome driver. Defaults to True.
+        """
+        self.max_pages = max_pages
+        self.headless = headless
+        self.block_resources = block_resources
+        self.driver_factory = driver_factory or (
+            lambda: create_chrome_driver(headless=self.headless, block_resources=self.block_resources)
+        )
+        self.driver = None
+        self.pages_on_driver = 0
+        self.restarts = 0
+        self.timings = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+        self.report()
+        return False
+
+    def _start(self):
+        """
+        Start a new driver and return the time it took in seconds.
+        """
+        started = time.perf_counter()
+        self.driver = self.driver_factory()
+        self.pages_on_driver = 0
+        self.restarts += 1
+        elapsed = time.perf_counter() - started
+        metrics.observe('stage_seconds', elapsed, stage='browser_startup')
+        return elapsed
+
+    def _record_bytes(self):
+        """
+        Add what the driver downloaded since the last navigation to the previous page.
+        """
+        if self.driver is None or not self.timings:
+            return
+        transferred = transferred_bytes(self.driver)
+        if transferred is not None:
+            self.timings[-1]['bytes'] += transferred
+            metrics.inc('browser_bytes_total', transferred)
+
+    def quit(self):
+        """
+        Quit the current driver, ignoring errors from an already dead browser.
+        """
+        if self.driver is not None:
+            self._record_bytes()
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = None
+
+    def get(self, url):
+        """
+        Navigate to a URL, starting or recycling the driver as needed.
+
+        A crashed driver is restarted once before the error is raised.
+
+        Args:
+            url (str): The URL to load.
+
+        Returns:
+            webdriver.Chrome: The driver with the page loaded.
+        """
+        startup = 0.0
+        self._record_bytes()
+        if self.driver is not None and self.pages_on_driver >= self.max_pages:
+            self.quit()
+        if self.driver is None:
+            startup += self._start()
+
+        started = time.perf_counter()
+        try:
+            self.driver.get(url)
+        except WebDriverException as e:
+            print(f'Driver crashed while loading {url}: {e.msg}. Restarting browser.')
+            self.quit()
+            startup += self._start()
+            started = time.perf_counter()
+            self.driver.get(url)
+        navigation = time.perf_counter() - started
+        metrics.observe('stage_seconds', navigation, stage='page_load')
+
+        self.pages_on_driver += 1
+        self.timings.append({'url': url, 'startup': startup, 'navigation': navigation, 'bytes': 0})
+        return self.driver
+
+    def report(self):
+        """
+        Print how much time per page went to browser startup and to navigation, and the bytes downloaded.
+        """
+        if not self.timings:
+            return
+        pages = len(self.timings)
+        startup = sum(t['startup'] for t in self.timings)
+        navigation = sum(t['navigation'] for t in self.timings)
+        transferred = sum(t['bytes'] for t in self.timings)
+        print(
+            f'Driver stats: {pages} pages, {self.restarts} browser starts, '
+            f'startup {startup / pages:.2f}s/page, navigation {navigation / pages:.2f}s/page, '
+            f'{transferred / pages / 1024:.0f} KiB/page'
+        )
+
+
+class DriverPool:
+    """
+    A bounded set of DriverManagers, one per worker thread.
+
+    Each thread that calls `get` gets its own browser, so a thread pool of N
+    workers never runs more than N browsers at once.
+    """
+
+    def __init__(self, max_pages=50, headless=True, driver_factory=None, block_resources=True):
+        """
+        Args:
+            max_pages (int, optional): Pages to load before a driver is recycled. Defaults to 50.
+            headless (bool, optional): Run the browsers without a window. Defaults to True.
+            driver_factory (callable, optional): Returns a new driver. Defaults to a Chrome driver.
+            block_resources (bool, optional): Block images, fonts, stylesheets, ads and analytics
+                in the default Chrome drivers. Defaults to True.
+        """
+        self.max_pages = max_pages
+        self.headless = headless
+        self.block_resources = block_resources
+        self.driver_factory = driver_factory
+        self.managers = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+        self.report()
+        return False
+
+    def manager(self):
+        """
+        Return the DriverManager owned by the calling thread, creating it if needed.
+        """
+        manager = getattr(self._local, 'manager', None)
+        if manager is None:
+            manager = DriverManager(self.max_pages, self.headless, self.driver_factory, self.block_resources)
+            self._local.manager = manager
+            with self._lock:
+                self.managers.append(manager)
+        return manager
+
+    def get(self, url):
+        """
+        Navigate the calling thread's driver to a URL.
+
+        Args:
+            url (str): The URL to load.
+
+        Returns:
+            webdriver.Chrome: The driver with the page loaded.
+        """
+        return self.manager().get(url)
+
+    def quit(self):
+        """
+        Quit every driver in the pool.
+        """
+        for manager in self.managers:
+            manager.quit()
+
+    def report(self):
+        """
+        Print startup and navigation time per page for every browser in the pool.
+        """
+        for manager in self.managers:
+            manager.report()
@@ -0,0 +1,214 @@
+"""
+Shared HTTP transport with connection pooling and keep-alive for all page fetches.
+"""
+
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from rate_limiter import MAX_RETRIES, RETRY_STATUSES, parse_retry_after, retry_delay, throttle_for
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+DEFAULT_POOL_SIZE = 10
+
+_session = None
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Create a requests session that keeps connections alive and reuses them.
+
+    Args:
+        pool_size (int, optional): Connections kept open per host. Defaults to 10.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def get_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Return the process-wide shared session, creating it on first use.
+
+    Args:
+        pool_size (int, optional): Connections kept open per host when the session is created. Defaults to 10.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        _session = create_session(pool_size)
+    return _session
+
+
+def get(url, session=None, **kwargs):
+    """
+    Send a GET request through the host's shared throttle, retrying on overload.
+
+    Responses with a 429 or 5xx status and connection errors are retried with
+    exponential backoff, honouring Retry-After. Once `MAX_RETRIES` retries are
+    used up the last response is returned, or the last connection error raised.
+
+    Args:
+        url (str): The URL to request.
+        session (requests.Session, optional): Session used for the request. Defaults to the shared session.
+        **kwargs: Passed on to `requests.Session.get`, e.g. `params` and `headers`.
+
+    Returns:
+        requests.Response: The response.
+    """
+    session = session or get_session()
+    throttle = throttle_for(url)
+    for attempt in range(MAX_RETRIES + 1):
+        time.sleep(throttle.reserve())
+        try:
+            with metrics.timer('fetch'):
+                response = session.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.inc('responses_total', status='error')
+            if attempt == MAX_RETRIES:
+                raise
+            throttle.on_throttled()
+            delay = retry_delay(attempt)
+            print(f'Retrying {url} in {delay:.1f}s after {e!r}')
+            time.sleep(delay)
+            continue
+        metrics.inc('responses_total', status=str(response.status_code))
+        metrics.inc('response_bytes_total', len(response.content))
+        if response.status_code not in RETRY_STATUSES:
+            throttle.on_success()
+            return response
+        if attempt == MAX_RETRIES:
+            return response
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        throttle.on_throttled(retry_after)
+        delay = retry_delay(attempt, retry_after)
+        print(f'Retrying {url} in {delay:.1f}s after status {response.status_code}')
+        time.sleep(delay)
+
+
+def fetch(url, cache=None, kind=None):
+    """
+    Download a page through the shared session, serving it from a cache when possible.
+
+    With a `kind`, an expired page whose `kind` record is cached is revalidated
+    with a conditional GET. A 304 is returned as is with an empty body, and the
+    caller reuses its cached record. Overloaded responses are retried as in `get`.
+
+    Args:
+        url (str): The URL to download.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in.
+        kind (str, optional): The record kind the caller stores in the cache.
+
+    Returns:
+        tuple: (status code, body bytes).
+    """
+    headers = {}
+    if cache is not None:
+        body = cache.get(url)
+        if body is not None:
+            return 200, body
+        if kind:
+            headers = cache.conditional_headers(url, kind)
+
+    response = get(url, headers=headers)
+    if cache is not None:
+        if response.status_code == 304:
+            cache.mark_not_modified(url)
+        elif response.status_code == 200:
+            cache.put(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return response.status_code, response.content
+
+
+def session_stats(session=None):
+    """
+    Count requests and opened connections per host for a session.
+
+    Args:
+        session (requests.Session, optional): The session to inspect. Defaults to the shared session.
+
+    Returns:
+        dict: Host -> {'requests', 'connections', 'reused'}.
+    """
+    session = session or get_session()
+    stats = {}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            host = stats.setdefault(pool.host, {'requests': 0, 'connections': 0, 'reused': 0})
+            host['requests'] += pool.num_requests
+            host['connections'] += pool.num_connections
+    for host in stats.values():
+        host['reused'] = host['requests'] - host['connections']
+    return stats
+
+
+def log_stats(stats, label='HTTP'):
+    """
+    Print connection reuse statistics.
+
+    Args:
+        stats (dict): Host -> {'requests', 'connections', 'reused'}, as returned by `session_stats`.
+        label (str, optional): Prefix for the printed lines. Defaults to 'HTTP'.
+    """
+    for host, counts in stats.items():
+        print(
+            f"{label} {host}: {counts['requests']} requests over {counts['connections']} connections "
+            f"({counts['reused']} handshakes saved)"
+        )
+
+
+def aiohttp_trace_config(stats):
+    """
+    Build an aiohttp trace config that records connection reuse and request latency into `stats`.
+
+    Args:
+        stats (dict): Filled with host -> {'requests', 'connections', 'reused', 'latencies'}, where
+            'latencies' lists the seconds each completed request took.
+
+    Returns:
+        aiohttp.TraceConfig: The trace config to pass to a ClientSession.
+    """
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+        context.counts = stats.setdefault(
+            params.url.host, {'requests': 0, 'connections': 0, 'reused': 0, 'latencies': []}
+        )
+        context.counts['requests'] += 1
+
+    async def on_request_end(session, context, params):
+        context.counts['latencies'].append(time.perf_counter() - context.started)
+
+    async def on_connection_create_end(session, context, params):
+        context.counts['connections'] += 1
+
+    async def on_connection_reuseconn(session, context, params):
+        context.counts['reused'] += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
@@ -0,0 +1,90 @@
+"""
+Extraction of property fields from the schema.org JSON-LD blocks of a listing page.
+
+The listing's coordinates are only published here. The other fields duplicate
+the details grid and are used only where the grid lacks them. The script
+blocks are found with a regular expression over the raw bytes.
+"""
+
+import json
+import re
+
+JSON_LD_PATTERN = re.compile(
+    rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+def iter_json_ld(content):
+    """
+    Yield every JSON-LD object embedded in a page.
+
+    Blocks that are not valid JSON are skipped. A block holding a list yields each item.
+
+    Args:
+        content (bytes): The HTML of the page.
+
+    Yields:
+        dict: A decoded JSON-LD object.
+    """
+    for match in JSON_LD_PATTERN.finditer(content):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict):
+                yield item
+
+
+def format_number(value):
+    """
+    Format a JSON number the way `parse_numeric_value` formats scraped numbers.
+
+    Args:
+        value (int | float | str): The number.
+
+    Returns:
+        str: The number without a trailing '.0', e.g. '435000' or '52.5'.
+    """
+    number = float(value)
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+def extract_json_ld_fields(content):
+    """
+    Extract property fields from the listing's Product/Apartment JSON-LD object.
+
+    Only fields present in the JSON-LD are returned; the caller fills in the rest.
+
+    Args:
+        content (bytes): The HTML of the listing page.
+
+    Returns:
+        dict: Field name -> value as a string, using the same field names as `parse_property_details`.
+    """
+    fields = {}
+    for item in iter_json_ld(content):
+        if 'offers' not in item and 'floorSize' not in item:
+            continue
+
+        offers = item.get('offers') or {}
+        floor_size = item.get('floorSize') or {}
+        address = item.get('address') or {}
+        geo = item.get('geo') or {}
+
+        if offers.get('price') is not None:
+            fields['Price'] = format_number(offers['price'])
+        if floor_size.get('value') is not None:
+            fields['Size'] = format_number(floor_size['value'])
+        if item.get('numberOfRooms') is not None:
+            fields['Rooms'] = str(item['numberOfRooms'])
+        if address.get('addressLocality'):
+            fields['District'] = address['addressLocality']
+        if address.get('addressRegion'):
+            fields['City'] = address['addressRegion']
+        if geo.get('latitude') is not None and geo.get('longitude') is not None:
+            fields['Latitude'] = str(geo['latitude'])
+            fields['Longitude'] = str(geo['longitude'])
+        break
+    return fields
@@ -0,0 +1,327 @@
+"""
+Process-wide timing histograms and counters for every stage of a crawl.
+
+Stages are timed into the `stage_seconds` histogram, labelled with the stage
+name: browser_startup, page_load, scroll, fetch, parse, normalize and write. Counters
+record response bytes, status codes, written records and missing fields.
+A snapshot can be printed, saved as JSON or Prometheus text, or served over
+HTTP while a crawl runs.
+
+Work done in parser processes is recorded there and merged back into the
+main process with `collect` and `merge`.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NAMESPACE = 'scraper'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metrics:
+    """
+    A registry of histograms and counters, keyed by name and labels.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (tuple, optional): Upper bounds of the histogram buckets in seconds.
+        """
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): The counter name, e.g. 'responses_total'.
+            value (float, optional): The amount to add. Defaults to 1.
+            **labels: Label values, e.g. status='200'.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Record one value in a histogram.
+
+        Args:
+            name (str): The histogram name, e.g. 'stage_seconds'.
+            value (float): The observed value.
+            **labels: Label values, e.g. stage='fetch'.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Time the enclosed block into the `stage_seconds` histogram.
+
+        Args:
+            stage (str): The stage name, e.g. 'parse'.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - started, stage=stage)
+
+    def state(self):
+        """
+        Return a picklable copy of every counter and histogram, for `merge`.
+
+        Returns:
+            tuple: (counters, histograms).
+        """
+        with self._lock:
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self.histograms.items()}
+            return dict(self.counters), histograms
+
+    def merge(self, state):
+        """
+        Add counters and histograms recorded elsewhere, e.g. in a worker process.
+
+        Args:
+            state (tuple): The result of another registry's `state`.
+        """
+        counters, histograms = state
+        with self._lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in histograms.items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    self.histograms[key] = dict(value, buckets=list(value['buckets']))
+                    continue
+                histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], value['buckets'])]
+                histogram['sum'] += value['sum']
+                histogram['count'] += value['count']
+
+    def snapshot(self):
+        """
+        Return every metric as JSON-serialisable data.
+
+        Returns:
+            dict: {'counters': [...], 'histograms': [...]}, each entry with its name and labels;
+            histogram buckets are cumulative and keyed by upper bound.
+        """
+        counters, histograms = self.state()
+        return {
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            'histograms': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                    'buckets': dict(zip([str(bound) for bound in self.buckets], _cumulative(histogram['buckets']))),
+                }
+                for (name, labels), histogram in sorted(histograms.items())
+            ],
+        }
+
+    def to_json(self):
+        """
+        Return the snapshot as a JSON string.
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """
+        Return the snapshot in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, names prefixed with 'scraper_'.
+        """
+        counters, histograms = self.state()
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = f'{NAMESPACE}_{name}'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} counter')
+                typed.add(metric)
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(histograms.items()):
+            metric = f'{NAMESPACE}_{name}'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} histogram')
+                typed.add(metric)
+            cumulative = _cumulative(histogram['buckets'])
+            for bound, count in zip(self.buckets, cumulative):
+                lines.append(f'{metric}_bucket{_format_labels(labels + (("le", str(bound)),))} {count}')
+            lines.append(f'{metric}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {histogram["sum"]}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Save a snapshot to a file: Prometheus text for '.prom' or '.txt' files, JSON otherwise.
+
+        Args:
+            path (str): The file to write.
+        """
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        print(f'Metrics saved to {path}')
+
+    def report(self):
+        """
+        Print the time spent in each stage and the response counts.
+        """
+        counters, histograms = self.state()
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name == 'stage_seconds' and histogram['count']:
+                print(
+                    f"Stage {dict(labels)['stage']}: {histogram['count']} calls, {histogram['sum']:.2f}s total, "
+                    f"{histogram['sum'] / histogram['count'] * 1000:.1f} ms mean"
+                )
+        statuses = {dict(labels)['status']: value for (name, labels), value in counters.items() if name == 'responses_total'}
+        if statuses:
+            print('Responses: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Serve live metrics over HTTP from a background thread.
+
+        `/metrics` returns Prometheus text and `/metrics.json` the JSON snapshot.
+
+        Args:
+            port (int): The port to listen on, or 0 for any free port.
+            host (str, optional): The address to bind. Defaults to '127.0.0.1'.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call `shutdown()` to stop it.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = registry.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f'Serving metrics on http://{host}:{server.server_address[1]}/metrics')
+        return server
+
+
+def _cumulative(counts):
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+_registry = Metrics()
+
+
+def get_registry():
+    """
+    Return the process-wide registry.
+
+    Returns:
+        Metrics: The registry the module-level functions record into.
+    """
+    return _registry
+
+
+def inc(name, value=1, **labels):
+    """
+    Add to a counter in the process-wide registry. See `Metrics.inc`.
+    """
+    _registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """
+    Record a histogram value in the process-wide registry. See `Metrics.observe`.
+    """
+    _registry.observe(name, value, **labels)
+
+
+def timer(stage):
+    """
+    Time a block into the process-wide registry. See `Metrics.timer`.
+    """
+    return _registry.timer(stage)
+
+
+def collect(function, *args):
+    """
+    Call a function with a fresh process-wide registry and return what it recorded.
+
+    Meant to run in a worker process, so the main process can `merge` the result.
+
+    Args:
+        function (callable): The function to call.
+        *args: Its arguments.
+
+    Returns:
+        tuple: (the function's result, the recorded metrics state).
+    """
+    global _registry
+    previous = _registry
+    _registry = Metrics(previous.buckets)
+    try:
+        return function(*args), _registry.state()
+    finally:
+        _registry = previous
+
+
+def merge(state):
+    """
+    Merge metrics recorded by `collect` into the process-wide registry.
+
+    Args:
+        state (tuple): The metrics state returned by `collect`.
+    """
+    _registry.merge(state)
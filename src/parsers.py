@@ -0,0 +1,188 @@
+"""
+Pluggable HTML parser backends behind a small CSS-selector interface.
+
+Every backend parses a page into a node that supports `select_one`, `select`
+and `text`, so extraction code runs unchanged on html.parser, lxml, html5lib
+or selectolax.
+"""
+
+import importlib.util
+
+
+def join_text(strings):
+    """
+    Join the text nodes of an element the way BeautifulSoup's html.parser tree does.
+
+    Whitespace-only text nodes collapse to a single newline (or a single space
+    if they contain no newline), so every backend returns the same text.
+
+    Args:
+        strings (iterable): The element's descendant text nodes, in document order.
+
+    Returns:
+        str: The joined text.
+    """
+    return ''.join(
+        string if string.strip() else ('\n' if '\n' in string else ' ')
+        for string in strings
+        if string
+    )
+
+
+class SoupNode:
+    """
+    A BeautifulSoup element behind the parser interface.
+    """
+
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def select_one(self, selector):
+        element = self.element.select_one(selector)
+        return SoupNode(element) if element is not None else None
+
+    def select(self, selector):
+        return [SoupNode(element) for element in self.element.select(selector)]
+
+    def text(self):
+        return join_text(self.element.strings)
+
+    def __str__(self):
+        return str(self.element)
+
+
+class SelectolaxNode:
+    """
+    A selectolax (lexbor) node behind the parser interface.
+    """
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def select_one(self, selector):
+        node = self.node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    def select(self, selector):
+        return [SelectolaxNode(node) for node in self.node.css(selector)]
+
+    def text(self):
+        return join_text(node.text_content for node in self.node.traverse(include_text=True) if node.tag == '-text')
+
+    def __str__(self):
+        return self.node.html
+
+
+def _soup_parser(features, supports_strainer=True):
+    def parse(content, only=None):
+        from bs4 import BeautifulSoup, SoupStrainer
+        parse_only = None
+        if only and supports_strainer:
+            parse_only = SoupStrainer([tag for tag, _ in only], class_=[classes for _, classes in only])
+        return SoupNode(BeautifulSoup(content, features, parse_only=parse_only))
+    return parse
+
+
+def _parse_selectolax(content, only=None):
+    from selectolax.lexbor import LexborHTMLParser
+    return SelectolaxNode(LexborHTMLParser(content).root)
+
+
+PARSERS = {
+    'html.parser': _soup_parser('html.parser'),
+    'lxml': _soup_parser('lxml'),
+    'html5lib': _soup_parser('html5lib', supports_strainer=False),
+    'selectolax': _parse_selectolax,
+}
+
+REQUIRED_MODULES = {
+    'html.parser': 'bs4',
+    'lxml': 'lxml',
+    'html5lib': 'html5lib',
+    'selectolax': 'selectolax',
+}
+
+
+def available_parsers():
+    """
+    Return the names of the parser backends whose libraries are installed.
+
+    Returns:
+        list: Parser names, in the order of `PARSERS`.
+    """
+    return [name for name in PARSERS if importlib.util.find_spec(REQUIRED_MODULES[name]) is not None]
+
+
+PREFERRED_PARSERS = ('selectolax', 'lxml', 'html.parser')
+
+DEFAULT_PARSER = next(name for name in PREFERRED_PARSERS if name in available_parsers())
+
+
+def parse_html(content, parser=None, only=None):
+    """
+    Parse an HTML document with the given backend.
+
+    With `only`, BeautifulSoup backends that support a SoupStrainer build a
+    tree for the matching elements alone. Other backends ignore it and parse
+    the whole document, so callers must select the same elements either way.
+
+    Args:
+        content (bytes): The HTML to parse.
+        parser (str, optional): One of `PARSERS`. Defaults to the fastest installed backend.
+        only (list, optional): (tag, space-separated classes) pairs of the elements to keep.
+
+    Returns:
+        SoupNode | SelectolaxNode: The document root.
+
+    Raises:
+        ValueError: If the parser name is unknown.
+    """
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSERS:
+        raise ValueError(f'Unknown parser {parser!r}, expected one of {", ".join(PARSERS)}')
+    return PARSERS[parser](content, only)
+
+
+def truncate_after(content, regions):
+    """
+    Cut a document after the last of the given regions so the parser stops early.
+
+    Each region is a (marker, closing) pair: the region ends at the first
+    `closing` after the last occurrence of `marker`. If any marker or its
+    closing is missing, the document is returned unchanged.
+
+    Args:
+        content (bytes): The HTML document.
+        regions (list): (marker bytes, closing bytes) pairs.
+
+    Returns:
+        bytes: The document up to the end of the last region.
+    """
+    end = 0
+    for marker, closing in regions:
+        start = content.rfind(marker)
+        if start == -1:
+            return content
+        close = content.find(closing, start)
+        if close == -1:
+            return content
+        end = max(end, close + len(closing))
+    return content[:end]
+
+
+def class_selector(tag, classes):
+    """
+    Build a CSS selector matching a tag that has all the given classes.
+
+    Args:
+        tag (str): The tag name.
+        classes (str): Space-separated class names, as in a `class` attribute.
+
+    Returns:
+        str: The CSS selector, e.g. 'h1.heading.listing-header__headline'.
+    """
+    return tag + ''.join(f'.{name}' for name in classes.split())
@@ -0,0 +1,88 @@
+"""
+Two-stage crawl pipeline: network downloads feed a process pool of parsers.
+
+Downloads run on the asyncio event loop while parsing runs in worker
+processes, so CPU-heavy parsing never blocks the next download and parse
+throughput scales with the number of cores.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from async_fetcher import fetch_pages
+
+
+async def _run(urls, parse, handle, workers, per_host, timeout, max_pending, cache, kind, refresh):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_pending)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        async def network_stage():
+            try:
+                async for url, status, body in fetch_pages(
+                    urls, per_host, timeout, cache, kind, max_in_flight=max(per_host, max_pending),
+                    refresh=refresh,
+                ):
+                    if status == 304:
+                        handle(url, cache.get_record(url, kind))
+                        continue
+                    if status != 200:
+                        print(f'Failed to retrieve {url}. Status code: {status}')
+                        continue
+                    await queue.put((url, loop.run_in_executor(executor, metrics.collect, parse, body)))
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.ensure_future(network_stage())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                url, parsed = item
+                record, recorded = await parsed
+                metrics.merge(recorded)
+                handle(url, record)
+            await producer
+        finally:
+            if not producer.done():
+                # Parsing or handling failed: stop downloading, and keep the queue
+                # drained so the network stage's final put does not block forever.
+                producer.cancel()
+                while not producer.done():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    await asyncio.sleep(0)
+
+
+def run_pipeline(urls, parse, handle, workers=None, per_host=8, timeout=30, max_pending=None, cache=None, kind=None,
+                 refresh=None):
+    """
+    Download pages and parse them in a process pool, passing each record to a callback.
+
+    Raw page bytes go from the network stage to the parser processes, and
+    parsed records come back through a bounded queue. When the queue is full
+    the network stage stops handing out work until the parsers catch up, and
+    no new downloads start meanwhile: at most `max_pending` pages (or
+    `per_host`, if larger) are downloading or downloaded but not yet queued.
+    Pages revalidated as not modified skip the parsers: the record cached
+    under `kind` is handed over directly. Metrics recorded while parsing are
+    merged into the main process.
+
+    Args:
+        urls (list): The URLs to download.
+        parse (callable): Picklable function turning page bytes into a record.
+        handle (callable): Called as `handle(url, record)` in the main process for every parsed page.
+        workers (int, optional): Parser processes. Defaults to the number of CPUs.
+        per_host (int, optional): Maximum concurrent requests per host. Defaults to 8.
+        timeout (float, optional): Timeout per request in seconds. Defaults to 30.
+        max_pending (int, optional): Pages queued for or in parsing at once. Defaults to twice the workers.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in.
+        kind (str, optional): The record kind the caller stores in the cache, enabling revalidation.
+        refresh (set, optional): URLs to download even if they are cached.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    asyncio.run(_run(urls, parse, handle, workers, per_host, timeout, max_pending, cache, kind, refresh))
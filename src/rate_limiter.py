@@ -0,0 +1,174 @@
+"""
+Per-host throttling shared by every fetcher: a token bucket for the request
+rate, AIMD adjustment of the number of concurrent requests, and retries with
+exponential backoff on 429/5xx responses.
+
+Each host gets one HostThrottle for the whole process, so the sync session
+and the asyncio fetcher draw from the same budget.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+# Longest Retry-After honoured, in seconds; it pauses the whole host, so
+# longer values would stall the crawl.
+MAX_RETRY_AFTER = 120.0
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+DEFAULT_MAX_CONCURRENCY = 8
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+class HostThrottle:
+    """
+    Rate and concurrency budget for one host.
+
+    Requests take a token from a bucket refilled at `rate` per second; when
+    the bucket is empty callers are given increasing waits rather than being
+    sent in a burst. The allowed concurrency grows by one per window of
+    successful requests and halves when the host signals overload.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            rate (float, optional): Sustained requests per second, or None for no rate limit. Defaults to 10.
+            burst (int, optional): Requests that may be sent back to back. Defaults to 10.
+            max_concurrency (int, optional): Upper bound for concurrent requests. Defaults to 8.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """
+        The number of requests currently allowed in flight.
+        """
+        return max(1, int(self.concurrency))
+
+    def reserve(self):
+        """
+        Take a token and return how long to wait before sending the request.
+
+        Returns:
+            float: Seconds to wait; 0 if a token was available and the host is not paused.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.rate is None:
+                return max(0.0, self.paused_until - now)
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def on_success(self):
+        """
+        Additive increase: one more concurrent request per `limit` successes.
+        """
+        with self._lock:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def on_throttled(self, retry_after=None):
+        """
+        Multiplicative decrease after a 429/5xx or a failed connection.
+
+        Args:
+            retry_after (float, optional): Seconds the host asked us to wait; pauses all requests to it.
+        """
+        with self._lock:
+            self.throttled += 1
+            self.concurrency = max(1.0, self.concurrency / 2)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def configure(rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    """
+    Set the rate limit of every host, including hosts already seen.
+
+    Args:
+        rate (float, optional): Sustained requests per second, or None for no rate limit. Defaults to 10.
+        burst (int, optional): Requests that may be sent back to back. Defaults to 10.
+    """
+    global DEFAULT_RATE, DEFAULT_BURST
+    with _throttles_lock:
+        DEFAULT_RATE, DEFAULT_BURST = rate, burst
+        for throttle in _throttles.values():
+            with throttle._lock:
+                throttle.rate, throttle.burst = rate, burst
+                throttle.tokens = min(throttle.tokens, burst)
+
+
+def throttle_for(url, max_concurrency=None):
+    """
+    Return the process-wide throttle for a URL's host, creating it on first use.
+
+    Args:
+        url (str): A URL on the host.
+        max_concurrency (int, optional): Concurrency bound for a newly created throttle. Defaults to 8.
+
+    Returns:
+        HostThrottle: The host's throttle.
+    """
+    host = urlsplit(url).netloc
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = HostThrottle(DEFAULT_RATE, DEFAULT_BURST, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        return _throttles[host]
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+
+    Args:
+        value (str | None): The header value.
+
+    Returns:
+        float | None: Seconds to wait, at most `MAX_RETRY_AFTER`, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+def retry_delay(attempt, retry_after=None, base=0.5, cap=30.0):
+    """
+    Return how long to wait before retry number `attempt`.
+
+    Args:
+        attempt (int): Zero-based number of the attempt that failed.
+        retry_after (float, optional): The server's Retry-After, which takes precedence.
+        base (float, optional): Backoff for the first retry in seconds. Defaults to 0.5.
+        cap (float, optional): Maximum backoff in seconds. Defaults to 30.
+
+    Returns:
+        float: Seconds to wait, using exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2 ** attempt))
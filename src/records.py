@@ -0,0 +1,209 @@
+"""
+The typed record of one property listing.
+
+Numbers are stored as ints and floats and missing values as None, instead of
+the strings and 'N/A' placeholders the parsers work with. Records convert to
+plain dictionaries for JSON storage and back, and to pandas DataFrames with
+one typed column per field.
+"""
+
+import math
+
+# (field name, attribute, type). Field names match the keys the parsers use.
+FIELDS = (
+    ('Title', 'title', str),
+    ('Price', 'price', int),
+    ('Size', 'size', float),
+    ('Address', 'address', str),
+    ('Description', 'description', str),
+    ('Building Year', 'building_year', int),
+    ('Apartment Type', 'apartment_type', str),
+    ('Debt-free Price', 'debt_free_price', int),
+    ('Maintenance Charge', 'maintenance_charge', float),
+    ('Living Area', 'living_area', float),
+    ('Rooms', 'rooms', int),
+    ('Floor', 'floor', int),
+    ('Total Floors', 'total_floors', int),
+    ('District', 'district', str),
+    ('City', 'city', str),
+    ('Latitude', 'latitude', float),
+    ('Longitude', 'longitude', float),
+    ('Total Area', 'total_area', float),
+    ('Plot Size', 'plot_size', float),
+    ('Room Layout', 'room_layout', str),
+    ('Condition', 'condition', str),
+    ('Housing Type', 'housing_type', str),
+    ('Availability', 'availability', str),
+    ('Sales Price', 'sales_price', int),
+    ('Debt Share', 'debt_share', int),
+    ('Financing Charge', 'financing_charge', float),
+    ('Total Charge', 'total_charge', float),
+    ('Water Charge', 'water_charge', float),
+    ('Heating', 'heating', str),
+    ('Energy Class', 'energy_class', str),
+    ('Building Material', 'building_material', str),
+    ('Elevator', 'elevator', str),
+    ('Sauna', 'sauna', str),
+    ('Balcony', 'balcony', str),
+    ('Plot Ownership', 'plot_ownership', str),
+    ('Housing Company', 'housing_company', str),
+    ('Apartments in Building', 'apartments_in_building', int),
+    ('URL', 'url', str),
+)
+
+ATTRIBUTES = {field: attribute for field, attribute, _ in FIELDS}
+
+MISSING = 'N/A'
+
+# pandas dtypes that keep missing values as nulls without turning ints into floats.
+PANDAS_DTYPES = {int: 'Int64', float: 'Float64', str: 'string'}
+
+
+def convert(value, kind):
+    """
+    Convert a scraped value to a field type.
+
+    Args:
+        value: The value, e.g. '435000', '262.50', 'N/A' or None.
+        kind (type): int, float or str.
+
+    Returns:
+        int | float | str | None: The converted value, or None if it is missing or not a number.
+    """
+    if value is None or value == MISSING or value == '':
+        return None
+    if kind is str:
+        return str(value)
+    if kind is int and isinstance(value, int):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    return round(number) if kind is int else number
+
+
+def to_text(value):
+    """
+    Format a field value for text output such as CSV.
+
+    Args:
+        value (int | float | str | None): The value.
+
+    Returns:
+        str: 'N/A' for None, whole floats without a trailing '.0', everything else as `str`.
+    """
+    if value is None:
+        return MISSING
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class PropertyRecord:
+    """
+    The details of one property listing, with typed fields.
+
+    Fields are attributes (`record.price`) and can also be read by their
+    field name (`record['Price']`).
+    """
+
+    __slots__ = tuple(attribute for _, attribute, _ in FIELDS)
+
+    def __init__(self, **values):
+        """
+        Args:
+            **values: Attribute values; attributes not given are None.
+        """
+        for _, attribute, _ in FIELDS:
+            setattr(self, attribute, values.pop(attribute, None))
+        if values:
+            raise TypeError(f"Unknown field(s): {', '.join(values)}")
+
+    def __getitem__(self, field):
+        return getattr(self, ATTRIBUTES[field])
+
+    def __eq__(self, other):
+        if not isinstance(other, PropertyRecord):
+            return NotImplemented
+        return all(getattr(self, attribute) == getattr(other, attribute) for attribute in self.__slots__)
+
+    def __repr__(self):
+        return f'PropertyRecord(title={self.title!r}, price={self.price!r}, city={self.city!r})'
+
+    @classmethod
+    def from_dict(cls, details):
+        """
+        Build a record from a dictionary keyed by field name.
+
+        Accepts both the typed dictionaries written by `to_dict` and the
+        string-valued ones the parsers produce, with 'N/A' for missing values.
+
+        Args:
+            details (dict): Field name -> value.
+
+        Returns:
+            PropertyRecord: The record.
+        """
+        record = cls.__new__(cls)
+        for field, attribute, kind in FIELDS:
+            setattr(record, attribute, convert(details.get(field), kind))
+        return record
+
+    def to_dict(self):
+        """
+        Return the record as a JSON-serialisable dictionary keyed by field name, with None for missing values.
+
+        Returns:
+            dict: Field name -> value.
+        """
+        return {field: getattr(self, attribute) for field, attribute, _ in FIELDS}
+
+    def missing_fields(self):
+        """
+        Return the names of the fields without a value.
+
+        Returns:
+            list: Field names.
+        """
+        return [field for field, attribute, _ in FIELDS if getattr(self, attribute) is None]
+
+
+def as_record(value):
+    """
+    Return a PropertyRecord for a record that may have been stored as a dictionary.
+
+    Args:
+        value (PropertyRecord | dict | None): A record, its `to_dict` form, or nothing.
+
+    Returns:
+        PropertyRecord | None: The record, or None for an empty value.
+    """
+    if not value:
+        return None
+    if isinstance(value, PropertyRecord):
+        return value
+    return PropertyRecord.from_dict(value)
+
+
+def to_dataframe(records):
+    """
+    Build a pandas DataFrame with one typed column per field.
+
+    Integer fields become nullable Int64 columns, floats Float64 and text
+    string columns, so missing values are nulls rather than 'N/A' strings.
+
+    Args:
+        records (list): PropertyRecord objects.
+
+    Returns:
+        pandas.DataFrame: One row per record, columns named by field.
+    """
+    import pandas as pd
+
+    return pd.DataFrame({
+        field: pd.array([getattr(record, attribute) for record in records], dtype=PANDAS_DTYPES[kind])
+        for field, attribute, kind in FIELDS
+    })
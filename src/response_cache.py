@@ -0,0 +1,294 @@
+"""
+Persistent on-disk cache of listing page responses.
+
+Bodies are stored zlib-compressed in a SQLite file, keyed by URL, and
+deduplicated by the SHA-256 of their content: many URLs returning the same
+page share one stored body. Entries expire after a TTL, and the least
+recently used entries are evicted once the stored bodies exceed a size limit.
+Eviction runs every `EVICT_EVERY` stores and when the cache is closed, and
+access times from cache hits are written in batches, so lookups and stores
+stay cheap during a crawl.
+
+The cache also keeps each URL's ETag/Last-Modified validators and the record
+parsed from it. Those outlive the TTL, so an expired page can be revalidated
+with a conditional GET and, on a 304, its record reused without downloading
+or parsing the page again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.path.join('.scrape_cache', 'responses.sqlite')
+
+# Stores between eviction passes, and cache hits between access time writes.
+EVICT_EVERY = 500
+ACCESS_BATCH = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (url, kind)
+);
+"""
+
+
+class ResponseCache:
+    """
+    A URL -> response body cache stored in a SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=6 * 3600, max_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            path (str, optional): The SQLite file to use. Defaults to '.scrape_cache/responses.sqlite'.
+            ttl (float, optional): Seconds an entry stays valid. Defaults to 6 hours.
+            max_bytes (int, optional): Compressed bytes to keep before evicting. Defaults to 512 MiB.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._accessed = {}
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def get(self, url):
+        """
+        Return the cached body for a URL, or None if it is missing or expired.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            bytes | None: The uncompressed body.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT bodies.body, entries.stored_at FROM entries JOIN bodies USING (hash) WHERE url = ?',
+                (url,),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._accessed[url] = now
+            if len(self._accessed) >= ACCESS_BATCH:
+                self._flush_accessed()
+                self._connection.commit()
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        Store the body of a successful response.
+
+        Args:
+            url (str): The page URL.
+            body (bytes): The uncompressed body.
+            etag (str, optional): The response's ETag header.
+            last_modified (str, optional): The response's Last-Modified header.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(url, None)
+            exists = self._connection.execute('SELECT 1 FROM bodies WHERE hash = ?', (digest,)).fetchone()
+            if not exists:
+                compressed = zlib.compress(body)
+                self._connection.execute(
+                    'INSERT INTO bodies (hash, body, size) VALUES (?, ?, ?)',
+                    (digest, compressed, len(compressed)),
+                )
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (url, hash, stored_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (url, digest, now, now),
+            )
+            self._connection.execute(
+                'INSERT OR REPLACE INTO validators (url, etag, last_modified) VALUES (?, ?, ?)',
+                (url, etag, last_modified),
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= EVICT_EVERY:
+                self._evict(now)
+            self._connection.commit()
+
+    def conditional_headers(self, url, kind):
+        """
+        Return the headers for revalidating a URL whose `kind` record is stored.
+
+        Without a stored record a 304 would leave nothing to reuse, so no
+        conditional headers are returned in that case.
+
+        Args:
+            url (str): The page URL.
+            kind (str): The record kind the caller would reuse.
+
+        Returns:
+            dict: If-None-Match and/or If-Modified-Since headers, possibly empty.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT etag, last_modified FROM validators JOIN records USING (url) WHERE url = ? AND kind = ?',
+                (url, kind),
+            ).fetchone()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def mark_not_modified(self, url):
+        """
+        Record a 304 response: the stored body, if any, is fresh again.
+
+        Args:
+            url (str): The page URL.
+        """
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(url, None)
+            self._connection.execute('UPDATE entries SET stored_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+            self._connection.commit()
+            self.not_modified += 1
+
+    def get_record(self, url, kind):
+        """
+        Return the record previously parsed from a URL.
+
+        Args:
+            url (str): The page URL.
+            kind (str): The record kind, e.g. the name of the script that parsed it.
+
+        Returns:
+            dict | None: The record, or None if none is stored.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT record FROM records WHERE url = ? AND kind = ?', (url, kind)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_record(self, url, kind, record):
+        """
+        Store the record parsed from a URL, for reuse when the page is not modified.
+
+        Args:
+            url (str): The page URL.
+            kind (str): The record kind, e.g. the name of the script that parsed it.
+            record (dict): The parsed record; must be JSON-serialisable.
+        """
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO records (url, kind, record) VALUES (?, ?, ?)',
+                (url, kind, json.dumps(record)),
+            )
+            self._connection.commit()
+
+    def _flush_accessed(self):
+        """
+        Write the access times of the cache hits since the last flush.
+        """
+        self._connection.executemany(
+            'UPDATE entries SET accessed_at = ? WHERE url = ?',
+            [(accessed_at, url) for url, accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self, now):
+        """
+        Drop expired entries, then least recently used ones until the bodies fit in `max_bytes`.
+
+        The entries to drop are chosen in one pass in access order. A body is
+        counted as freed once its last entry is dropped, so bodies shared by
+        several URLs are handled correctly.
+        """
+        self._flush_accessed()
+        self._puts_since_evict = 0
+        connection = self._connection
+        connection.execute('DELETE FROM entries WHERE stored_at < ?', (now - self.ttl,))
+        self._delete_orphan_bodies()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        references = dict(connection.execute('SELECT hash, COUNT(*) FROM entries GROUP BY hash'))
+        evicted = []
+        for url, digest, size in connection.execute(
+            'SELECT url, hash, size FROM entries JOIN bodies USING (hash) ORDER BY accessed_at'
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            references[digest] -= 1
+            if not references[digest]:
+                total -= size
+        connection.executemany('DELETE FROM entries WHERE url = ?', evicted)
+        self._delete_orphan_bodies()
+
+    def _delete_orphan_bodies(self):
+        """
+        Delete bodies no entry refers to.
+        """
+        self._connection.execute('DELETE FROM bodies WHERE hash NOT IN (SELECT hash FROM entries)')
+
+    def report(self):
+        """
+        Print the hit/miss ratio of this run.
+        """
+        lookups = self.hits + self.misses
+        if lookups:
+            print(
+                f'Response cache: {self.hits} hits, {self.misses} misses ({self.hits / lookups:.0%} hit ratio), '
+                f'{self.not_modified} revalidated as not modified'
+            )
+
+    def close(self):
+        """
+        Evict, print the hit/miss ratio and close the cache file.
+        """
+        with self._lock:
+            self._evict(time.time())
+            self._connection.commit()
+        self.report()
+        self._connection.close()
@@ -3,66 +3,481 @@ Script to scrape property listings and details from a real estate website.
 """
 
 import requests
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import pandas as pd
-import csv
+import os
 import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import metrics
+from async_fetcher import fetch_all
+from cards import CARD_SUMMARY_SELECTORS, make_card
+from crawl_journal import DEFAULT_JOURNAL_DIR, CrawlJournal, journal_path
+from crawl_state import DEFAULT_STATE_PATH, CrawlState
+from driver_manager import DriverManager, DriverPool
+from http_session import fetch, log_stats, session_stats
+from json_ld import extract_json_ld_fields
+from parsers import class_selector, parse_html, truncate_after
+from pipeline import run_pipeline
+from records import FIELDS, PropertyRecord, as_record
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from sinks import CsvSink
+from search_api import fetch_listing_cards_http
+
+# Listings from the Kalasatama area, offered by the interactive prompt.
+DEFAULT_SEARCH_URL = 'https://asunnot.oikotie.fi/myytavat-asunnot?locations=%5B%5B5695451,4,%22Kalasatama,%20Helsinki%22%5D%5D&cardType=100&roomCount%5B%5D=2'
+
+# The listing links on a search results page.
+CARD_SELECTOR = 'a.ot-card-v2.link.link--muted'
+
+# Stop scrolling once no new listing card has appeared for this long, or after the timeout.
+SCROLL_QUIET_PERIOD = 1.0
+SCROLL_TIMEOUT = 15.0
+
+# Scrolls to the bottom and again each time the page adds cards, until no
+# card has been added for the quiet period. Calls back with the card count.
+SCROLL_UNTIL_QUIET_SCRIPT = """
+const [selector, quietMs, timeoutMs, done] = arguments;
+const count = () => document.querySelectorAll(selector).length;
+const scroll = () => window.scrollTo(0, document.body.scrollHeight);
+let cards = count();
+let finished = false;
+let quiet = setTimeout(finish, quietMs);
+const deadline = setTimeout(finish, timeoutMs);
+const observer = new MutationObserver(() => {
+    const now = count();
+    if (now === cards) return;
+    cards = now;
+    scroll();
+    clearTimeout(quiet);
+    quiet = setTimeout(finish, quietMs);
+});
+function finish() {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(quiet);
+    clearTimeout(deadline);
+    done(count());
+}
+observer.observe(document.body, {childList: true, subtree: true});
+scroll();
+"""
+
+# Returns [href, summary] for every card. The summary joins the price, size
+# and room layout elements the way `cards.join_summary` does, so fingerprints
+# match cards found through the search API.
+EXTRACT_CARDS_SCRIPT = """
+const [selector, summarySelectors] = arguments;
+return Array.from(document.querySelectorAll(selector), card => [
+    card.getAttribute('href'),
+    summarySelectors.map(summarySelector => {
+        const element = card.querySelector(summarySelector);
+        return element ? element.textContent.trim().replace(/\\s+/g, ' ') : '';
+    }).join(' | '),
+]);
+"""
+
+def scroll_until_quiet(driver, quiet_period=SCROLL_QUIET_PERIOD, timeout=SCROLL_TIMEOUT):
+    """
+    Scroll a search results page until it stops adding listing cards.
+
+    A MutationObserver in the page scrolls to the bottom again whenever new
+    cards are added, and the wait ends once none have been added for
+    `quiet_period` seconds, so pages that load everything at once cost one
+    quiet period instead of repeated polling.
+
+    Args:
+        driver (webdriver.Chrome): A driver with the search results page loaded.
+        quiet_period (float, optional): Seconds without new cards before stopping. Defaults to 1.
+        timeout (float, optional): Maximum seconds to keep scrolling. Defaults to 15.
+
+    Returns:
+        int: The number of listing cards on the page.
+    """
+    driver.set_script_timeout(timeout + 5)
+    return driver.execute_async_script(
+        SCROLL_UNTIL_QUIET_SCRIPT, CARD_SELECTOR, int(quiet_period * 1000), int(timeout * 1000)
+    )
+
+def scrape_listing_page(driver, cancelled=None):
+    """
+    Scroll a loaded search results page until no more cards load and collect its listing cards.
+
+    Args:
+        driver (webdriver.Chrome): A driver with the search results page loaded.
+        cancelled (threading.Event, optional): Stops waiting for cards when set; the page then counts as empty.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}) for the listings on the page.
+    """
+    cards_present = EC.presence_of_all_elements_located((By.CLASS_NAME, 'ot-card-v2__info-container'))
+    WebDriverWait(driver, 20).until(
+        lambda driver: (cancelled is not None and cancelled.is_set()) or cards_present(driver)
+    )
+    if cancelled is not None and cancelled.is_set():
+        return []
+
+    with metrics.timer('scroll'):
+        scroll_until_quiet(driver)
 
-def fetch_listing_urls(base_url):
+    # One script call returns just the cards, instead of transferring and reparsing the whole page source.
+    cards = driver.execute_script(EXTRACT_CARDS_SCRIPT, CARD_SELECTOR, list(CARD_SUMMARY_SELECTORS))
+    return [make_card(href, summary) for href, summary in cards if href]
+
+def load_listing_page(manager, url, cancelled=None):
+    """
+    Load a search results page and collect its listing cards, restarting a crashed browser once.
+
+    A browser that dies while the page is scrolled or read is quit and the
+    page is loaded again in a fresh one. Timeouts waiting for cards are not
+    crashes and are raised as they are.
+
+    Args:
+        manager (DriverManager): The manager whose browser loads the page.
+        url (str): The search results page.
+        cancelled (threading.Event, optional): Stops waiting for cards when set; the page then counts as empty.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}) for the listings on the page.
+    """
+    driver = manager.get(url)
+    try:
+        return scrape_listing_page(driver, cancelled)
+    except TimeoutException:
+        raise
+    except WebDriverException as e:
+        print(f'Driver crashed while reading {url}: {e.msg}. Restarting browser.')
+        manager.quit()
+        return scrape_listing_page(manager.get(url), cancelled)
+
+def fetch_listing_urls(base_url, max_pages_per_driver=50):
     """
     Fetch all listing URLs from the given base URL.
-    
+
     Args:
         base_url (str): The base URL to fetch the listings from.
+        max_pages_per_driver (int, optional): Pages to load before recycling the browser. Defaults to 50.
 
     Returns:
         list: A list of listing URLs.
     """
-    all_listing_urls = []
+    return [card['url'] for card in fetch_listing_cards(base_url, max_pages_per_driver)]
+
+def fetch_listing_cards(base_url, max_pages_per_driver=50, block_resources=True):
+    """
+    Fetch all listing cards from the given base URL.
+
+    One browser is reused for every results page and only restarted after
+    `max_pages_per_driver` pages or a crash.
+    
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        max_pages_per_driver (int, optional): Pages to load before recycling the browser. Defaults to 50.
+        block_resources (bool, optional): Skip images, fonts, stylesheets, ads and analytics. Defaults to True.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}).
+    """
+    all_listing_cards = []
     page_index = 1
-    while True:
-        url = f"{base_url}&pagination={page_index}"
-        print(f"Fetching listings from: {url}")
+    with DriverManager(max_pages=max_pages_per_driver, block_resources=block_resources) as manager:
+        while True:
+            url = f"{base_url}&pagination={page_index}"
+            print(f"Fetching listings from: {url}")
 
-        driver = webdriver.Chrome()  # or webdriver.Firefox() if you are using Firefox
-        driver.get(url)
+            listing_cards = load_listing_page(manager, url)
 
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.CLASS_NAME, 'ot-card-v2__info-container'))
-        )
+            print(f'Found {len(listing_cards)} listing URLs on page {page_index}')
 
-        last_height = driver.execute_script("return document.body.scrollHeight")
+            all_listing_cards.extend(listing_cards)
+            if len(listing_cards) < 10:
+                break
+
+            page_index += 1
+
+    return all_listing_cards
+
+def fetch_listing_urls_parallel(base_url, **kwargs):
+    """
+    Fetch all listing URLs from the given base URL with a pool of browsers.
+
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        **kwargs: Passed on to `fetch_listing_cards_parallel`.
+
+    Returns:
+        list: A list of listing URLs in page order.
+    """
+    return [card['url'] for card in fetch_listing_cards_parallel(base_url, **kwargs)]
+
+def fetch_listing_cards_parallel(base_url, pool_size=4, lookahead=2, max_pages_per_driver=50, block_resources=True):
+    """
+    Fetch all listing cards from the given base URL with a pool of browsers.
+
+    Up to `pool_size` results pages are loaded at once and `lookahead` more
+    pages are queued speculatively. As soon as a page returns fewer than 10
+    listings it is known to be the last one: queued pages after it are
+    cancelled, and pages after it that are already loading stop waiting for
+    cards. A page that never shows any listing cards counts as empty.
+
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        pool_size (int, optional): Number of browsers loading pages at once. Defaults to 4.
+        lookahead (int, optional): Extra pages to queue ahead of the running ones. Defaults to 2.
+        max_pages_per_driver (int, optional): Pages to load before recycling a browser. Defaults to 50.
+        block_resources (bool, optional): Skip images, fonts, stylesheets, ads and analytics. Defaults to True.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}) in page order.
+    """
+    def fetch_page(url, cancelled):
+        try:
+            return load_listing_page(pool.manager(), url, cancelled)
+        except TimeoutException:
+            print(f'No listings appeared on {url}')
+            return []
+
+    results = {}
+    pending = {}
+    cancel_events = {}
+    last_page = None
+    next_page = 1
+    with DriverPool(max_pages=max_pages_per_driver, block_resources=block_resources) as pool, ThreadPoolExecutor(max_workers=pool_size) as executor:
         while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            WebDriverWait(driver, 10).until(
-                lambda driver: driver.execute_script("return document.readyState") == "complete"
-            )
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+            while len(pending) < pool_size + lookahead and (last_page is None or next_page <= last_page):
+                url = f"{base_url}&pagination={next_page}"
+                print(f"Fetching listings from: {url}")
+                cancel_events[next_page] = threading.Event()
+                pending[executor.submit(fetch_page, url, cancel_events[next_page])] = next_page
+                next_page += 1
+
+            if not pending:
                 break
-            last_height = new_height
 
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_index = pending.pop(future)
+                listing_cards = future.result()
+                results[page_index] = listing_cards
+                print(f'Found {len(listing_cards)} listing URLs on page {page_index}')
+                if len(listing_cards) < 10 and (last_page is None or page_index < last_page):
+                    last_page = page_index
+
+            if last_page is not None:
+                for future, page_index in list(pending.items()):
+                    if page_index > last_page:
+                        future.cancel()
+                        cancel_events[page_index].set()
+                        del pending[future]
+
+    all_listing_cards = []
+    for page_index in sorted(results):
+        if page_index <= last_page:
+            all_listing_cards.extend(results[page_index])
+    return all_listing_cards
+
+def discover_listing_urls(base_url, mode='http', browsers=1):
+    """
+    Discover all listing URLs for a search, preferring the JSON search API.
 
-        listing_tags = soup.find_all('a', class_='ot-card-v2 link link--muted')
-        listing_urls = [tag['href'] for tag in listing_tags]
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        mode (str, optional): 'http' or 'selenium'. Defaults to 'http'.
+        browsers (int, optional): Browsers loading results pages at once when Selenium is used. Defaults to 1.
+
+    Returns:
+        list: A list of listing URLs.
+    """
+    return [card['url'] for card in discover_listing_cards(base_url, mode, browsers)]
+
+def discover_listing_cards(base_url, mode='http', browsers=1):
+    """
+    Discover all listing cards for a search, preferring the JSON search API.
+
+    In 'http' mode the search API is tried first and Selenium is used only if
+    the API request or its response fails. In 'selenium' mode the browser is
+    used directly. With more than one browser, results pages are loaded by a
+    pool of browsers in parallel.
+
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        mode (str, optional): 'http' or 'selenium'. Defaults to 'http'.
+        browsers (int, optional): Browsers loading results pages at once when Selenium is used. Defaults to 1.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}).
+    """
+    if mode == 'http':
+        try:
+            return fetch_listing_cards_http(base_url)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f'HTTP discovery failed ({e}), falling back to Selenium')
+    if browsers > 1:
+        return fetch_listing_cards_parallel(base_url, pool_size=browsers)
+    return fetch_listing_cards(base_url)
+
+# Key under which parsed records are cached for reuse on 304 responses.
+RECORD_KIND = 'listing'
+
+TITLE_CLASSES = 'heading heading--no-styling listing-header__headline listing-header__headline--secondary customer-color margined margined--v15'
+HEADER_PRIMARY_CLASSES = 'heading heading--title-1 listing-header__headline listing-header__headline--primary customer-color'
+CONTENT_SECTION_CLASSES = 'content content--primary-background center-on-wallpaper padded padded--v10-h15 padded--desktop-v10-h15 padded--xdesktop-v10-h0 padded--topless'
+TITLE_SELECTOR = class_selector('h1', TITLE_CLASSES)
+HEADER_PRIMARY_SELECTOR = class_selector('h2', HEADER_PRIMARY_CLASSES)
+HEADER_TEXT_SELECTOR = 'span.listing-header__text'
+DESCRIPTION_SELECTOR = class_selector('span', 'listing-header__text listing-header__text--cut-overflow')
+CONTENT_SECTION_SELECTOR = class_selector('div', CONTENT_SECTION_CLASSES)
+LISTING_DETAILS_SELECTOR = 'div.listing-details-container'
+
+# Elements parse_html_details reads, and where each ends in the raw page,
+# for partial parsing.
+PARTIAL_PARSE_ONLY = [
+    ('h1', TITLE_CLASSES),
+    ('h2', HEADER_PRIMARY_CLASSES),
+    ('div', CONTENT_SECTION_CLASSES),
+    ('div', 'listing-details-container'),
+]
+PARTIAL_PARSE_REGIONS = [
+    (b'listing-header__headline--primary', b'</h2>'),
+    (b'details-grid__item-value', b'</dl>'),
+    (b'info-table__value', b'</dl>'),
+]
+
+# Labels of the details grid and of the info tables below it: (label, field,
+# kind, unit). 'text' values are kept as shown, 'number' values are stripped
+# of the unit and formatting, and 'floor' splits '6 / 8' into Floor and Total
+# Floors. The grid is read first, so a label in both places keeps the grid's
+# value. Labels without a field are known but not stored; labels missing from
+# the table are counted in the `details_labels_unmapped_total` metric.
+DETAILS_GRID = [
+    # Apartment
+    ('Sijainti', None, None, None),
+    ('Kaupunginosa', 'District', 'text', None),
+    ('Kaupunki', 'City', 'text', None),
+    ('Kohdenumero', None, None, None),
+    ('Kerros', 'Floor', 'floor', None),
+    ('Asuinpinta-ala', 'Living Area', 'number', 'm²'),
+    ('Kokonaispinta-ala', 'Total Area', 'number', 'm²'),
+    ('Pinta-alojen lisätiedot', None, None, None),
+    ('Huoneita', 'Rooms', 'text', None),
+    ('Huoneiston kokoonpano', 'Room Layout', 'text', None),
+    ('Kunto', 'Condition', 'text', None),
+    ('Lisätietoa vapautumisesta', 'Availability', 'text', None),
+    ('Keittiön varusteet', None, None, None),
+    ('Kylpyhuoneen varusteet', None, None, None),
+    ('Olohuoneen varusteet', None, None, None),
+    ('Lisätietoja makuuhuoneen varusteista', None, None, None),
+    ('Parveke', 'Balcony', 'text', None),
+    ('Parvekkeen lisätiedot', None, None, None),
+    ('Näkymät', None, None, None),
+    ('Asumistyyppi', 'Housing Type', 'text', None),
+    ('Kohde on', None, None, None),
+    ('Uudiskohde', None, None, None),
+    ('Palvelut', None, None, None),
+    ('Lisätiedot', None, None, None),
+    ('Linkit', None, None, None),
+    # Price and charges. Velkaosuus and Rahoitusvastike are only listed for
+    # apartments that carry company debt.
+    ('Velaton hinta', 'Debt-free Price', 'number', '€'),
+    ('Myyntihinta', 'Sales Price', 'number', '€'),
+    ('Velkaosuus', 'Debt Share', 'number', '€'),
+    ('Neliöhinta', None, None, None),
+    ('Hoitovastike', 'Maintenance Charge', 'number', '€ / kk'),
+    ('Rahoitusvastike', 'Financing Charge', 'number', '€ / kk'),
+    ('Yhtiövastike yhteensä', 'Total Charge', 'number', '€ / kk'),
+    ('Vesimaksu', 'Water Charge', 'number', '€ / kk'),
+    ('Vesimaksun lisätiedot', None, None, None),
+    ('Muut kustannukset', None, None, None),
+    # Building and plot
+    ('Taloyhtiön nimi', 'Housing Company', 'text', None),
+    ('Rakennuksen tyyppi', 'Apartment Type', 'text', None),
+    ('Rakennusvuosi', 'Building Year', 'text', None),
+    ('Huoneistojen lukumäärä', 'Apartments in Building', 'number', None),
+    ('Kerroksia', 'Total Floors', 'number', None),
+    ('Hissi', 'Elevator', 'text', None),
+    ('Taloyhtiössä on sauna', 'Sauna', 'text', None),
+    ('Rakennusmateriaali', 'Building Material', 'text', None),
+    ('Kattomateriaali', None, None, None),
+    ('Kattotyyppi', None, None, None),
+    ('Energialuokka', 'Energy Class', 'text', None),
+    ('Energiatodistus', None, None, None),
+    ('Lisätietoja lämmityksestä', 'Heating', 'text', None),
+    ('Tontin pinta-ala', 'Plot Size', 'number', 'm²'),
+    ('Tontin koko', 'Plot Size', 'number', 'm²'),
+    ('Tontin omistus', 'Plot Ownership', 'text', None),
+    ('Kaavatilanne', None, None, None),
+    ('Kaavoitustiedot', None, None, None),
+    # Housing company
+    ('Kiinteistönhoito', None, None, None),
+    ('Isännöinti', None, None, None),
+    ('Pysäköintitilan kuvaus', None, None, None),
+    ('Yhteiset tilat', None, None, None),
+    ('Tehdyt remontit', None, None, None),
+    ('Tulevat remontit', None, None, None),
+]
+
+# Readers store the first value seen for a field: text in `details`, numbers
+# as (text, unit) in `numeric` for normalising after the walk.
+def _read_text(field, unit, value, details, numeric):
+    details.setdefault(field, value)
+
+def _read_number(field, unit, value, details, numeric):
+    numeric.setdefault(field, (value, unit))
+
+def _read_floor(field, unit, value, details, numeric):
+    floor_info = value.split('/')
+    if len(floor_info) == 2:
+        numeric.setdefault('Floor', (floor_info[0], None))
+        numeric.setdefault('Total Floors', (floor_info[1], None))
+    else:
+        numeric.setdefault('Floor', (value, None))
+
+GRID_READERS = {'text': _read_text, 'number': _read_number, 'floor': _read_floor}
 
-        driver.quit()
+def compile_details_grid(table):
+    """
+    Build the lookup used for every details-grid row from a declarative table.
+
+    Args:
+        table (list): (label, field, kind, unit) tuples, as in `DETAILS_GRID`.
 
-        print(f'Found {len(listing_urls)} listing URLs on page {page_index}')
+    Returns:
+        dict: Label -> reader called as `reader(value, details, numeric)`, or None for labels that are skipped.
+    """
+    return {
+        label: partial(GRID_READERS[kind], field, unit) if field else None
+        for label, field, kind, unit in table
+    }
 
-        all_listing_urls.extend(listing_urls)
-        if len(listing_urls) < 10:
-            break
+DETAILS_GRID_READERS = compile_details_grid(DETAILS_GRID)
 
-        page_index += 1
+def read_details_row(dt, dd, details, numeric):
+    """
+    Store the value of one details-grid or info-table row through `DETAILS_GRID_READERS`.
 
-    return all_listing_urls
+    Args:
+        dt: The row's label node.
+        dd: The row's value node.
+        details (dict): Text fields read so far, updated in place.
+        numeric (dict): Numeric fields as (text, unit), updated in place.
+    """
+    key = dt.text().strip()
+    if key not in DETAILS_GRID_READERS:
+        metrics.inc('details_labels_unmapped_total', label=key)
+        return
+    read = DETAILS_GRID_READERS[key]
+    if read is not None:
+        read(dd.text().strip(), details, numeric)
+
+# Fields read from listing pages; the page tables have no coordinates, so those come from JSON-LD.
+PROPERTY_FIELDS = [field for field, _, _ in FIELDS if field != 'URL']
+HTML_FIELDS = [field for field in PROPERTY_FIELDS if field not in ('Latitude', 'Longitude')]
 
 def parse_numeric_value(value, unit=None):
     """
@@ -81,169 +496,326 @@ def parse_numeric_value(value, unit=None):
     value = value.replace(',', '.')
     return value
 
-def fetch_property_details(url):
+def fetch_property_details(url, parser=None, cache=None):
     """
     Fetch property details from a given URL.
     
     Args:
         url (str): The URL of the property listing.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in. Pages
+            that have not changed since the last crawl are not downloaded or parsed again.
 
     Returns:
-        dict: A dictionary containing property details.
+        PropertyRecord | None: The property details, or None if the page could not be retrieved.
     """
     print(f'Scraping URL: {url}')
-    response = requests.get(url)
+    status, content = fetch(url, cache, RECORD_KIND)
+
+    if status == 304:
+        property_details = as_record(cache.get_record(url, RECORD_KIND))
+        if property_details is not None:
+            property_details.url = url
+        return property_details
+
+    if status != 200:
+        print(f'Failed to retrieve the page. Status code: {status}')
+        return None
+
+    property_details = parse_property_details(content, parser)
+    property_details.url = url
+    if cache is not None:
+        cache.put_record(url, RECORD_KIND, property_details.to_dict())
+    return property_details
 
-    if response.status_code != 200:
-        print(f'Failed to retrieve the page. Status code: {response.status_code}')
-        return {}
+def parse_property_details(content, parser=None):
+    """
+    Parse property details from a listing page.
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    Args:
+        content (bytes): The HTML of the property listing page.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
 
-    title_tag = soup.find(
-        'h1',
-        class_='heading heading--no-styling listing-header__headline listing-header__headline--secondary customer-color margined margined--v15',
-    )
-    title = title_tag.text.strip() if title_tag else 'N/A'
+    Returns:
+        PropertyRecord: The property details.
+    """
+    property_details, _ = extract_property_details(content, parser)
+    return property_details
 
-    header_primary = soup.find(
-        'h2',
-        class_='heading heading--title-1 listing-header__headline listing-header__headline--primary customer-color',
-    )
-    price = 'N/A'
-    size = 'N/A'
+def extract_property_details(content, parser=None):
+    """
+    Extract property details from the details grid, filling gaps from JSON-LD.
+
+    The details grid is always walked. The JSON-LD blocks are read afterwards
+    only for the fields the grid did not supply; in practice that is the
+    coordinates, which the grid never shows.
+
+    Args:
+        content (bytes): The HTML of the property listing page.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+
+    Returns:
+        tuple: (PropertyRecord, dict of field -> 'html', 'json-ld' or 'missing').
+    """
+    property_details = dict.fromkeys(PROPERTY_FIELDS, 'N/A')
+    sources = dict.fromkeys(PROPERTY_FIELDS, 'missing')
+
+    with metrics.timer('parse'):
+        html_details = parse_html_details(content, parser)
+        for field in HTML_FIELDS:
+            if html_details.get(field, 'N/A') != 'N/A':
+                property_details[field] = html_details[field]
+                sources[field] = 'html'
+
+        for field, value in extract_json_ld_fields(content).items():
+            if sources[field] == 'missing':
+                property_details[field] = value
+                sources[field] = 'json-ld'
+
+    for field, source in sources.items():
+        if source == 'missing':
+            metrics.inc('fields_missing_total', field=field)
+    return PropertyRecord.from_dict(property_details), sources
+
+def parse_html_details(content, parser=None, partial=True):
+    """
+    Parse property details from the listing header, details grid and info tables of a listing page.
+
+    With `partial`, the page is cut after the info tables before parsing and,
+    where the backend supports it, a tree is built only for the header, the
+    content section and the listing details.
+
+    Args:
+        content (bytes): The HTML of the property listing page.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+        partial (bool, optional): Parse only the regions the details come from. Defaults to True.
+
+    Returns:
+        dict: A dictionary containing property details.
+    """
+    if partial:
+        document = parse_html(truncate_after(content, PARTIAL_PARSE_REGIONS), parser, only=PARTIAL_PARSE_ONLY)
+    else:
+        document = parse_html(content, parser)
+
+    title_tag = document.select_one(TITLE_SELECTOR)
+    title = title_tag.text().strip() if title_tag else 'N/A'
+
+    # Numeric fields are collected as (text, unit) and normalised after the walk.
+    numeric = {}
+
+    header_primary = document.select_one(HEADER_PRIMARY_SELECTOR)
     if header_primary:
-        header_texts = header_primary.find_all('span', class_='listing-header__text')
+        header_texts = header_primary.select(HEADER_TEXT_SELECTOR)
         if len(header_texts) >= 2:
-            price = parse_numeric_value(header_texts[0].text.strip(), "€")
-            size = parse_numeric_value(header_texts[1].text.strip(), "m²")
-
-    address_tag = title_tag.find('span', class_='listing-header__text')
-    address = address_tag.text.strip() if address_tag else 'N/A'
-
-    description_tag = soup.find('span', class_='listing-header__text listing-header__text--cut-overflow')
-    description = description_tag.text.strip() if description_tag else 'N/A'
-
-    building_year = 'N/A'
-    apartment_type = 'N/A'
-    debt_free_price = 'N/A'
-    maintenance_charge = 'N/A'
-    living_area = 'N/A'
-    rooms = 'N/A'
-    floor = 'N/A'
-    total_floors = 'N/A'
-    district = 'N/A'
-    city = 'N/A'
-
-    content_section = soup.find(
-        'div',
-        class_='content content--primary-background center-on-wallpaper padded padded--v10-h15 padded--desktop-v10-h15 padded--xdesktop-v10-h0 padded--topless',
-    )
+            numeric['Price'] = (header_texts[0].text().strip(), "€")
+            numeric['Size'] = (header_texts[1].text().strip(), "m²")
+
+    address_tag = title_tag.select_one(HEADER_TEXT_SELECTOR) if title_tag else None
+    address = address_tag.text().strip() if address_tag else 'N/A'
+
+    description_tag = document.select_one(DESCRIPTION_SELECTOR)
+    description = description_tag.text().strip() if description_tag else 'N/A'
+
+    grid = {}
+    content_section = document.select_one(CONTENT_SECTION_SELECTOR)
     if content_section:
-        for dl in content_section.find_all('dl'):
-            dt = dl.find('dt', class_='details-grid__item-title')
-            dd = dl.find('dd', class_='details-grid__item-value')
+        for dl in content_section.select('dl'):
+            dt = dl.select_one('dt.details-grid__item-title')
+            dd = dl.select_one('dd.details-grid__item-value')
             if dt and dd:
-                key = dt.text.strip()
-                value = dd.text.strip()
-                if key == 'Rakennusvuosi':
-                    building_year = value
-                elif key == 'Rakennuksen tyyppi':
-                    apartment_type = value
-                elif key == 'Velaton hinta':
-                    debt_free_price = parse_numeric_value(value, "€")
-                elif key == 'Hoitovastike':
-                    maintenance_charge = parse_numeric_value(value, "€ / kk")
-                elif key == 'Asuinpinta-ala':
-                    living_area = parse_numeric_value(value, "m²")
-                elif key == 'Huoneita':
-                    rooms = value
-                elif key == 'Kerros':
-                    floor_info = value.split('/')
-                    if len(floor_info) == 2:
-                        floor = parse_numeric_value(floor_info[0])
-                        total_floors = parse_numeric_value(floor_info[1])
-                    else:
-                        floor = parse_numeric_value(value)
-                elif key == 'Kaupunginosa':
-                    district = value
-                elif key == 'Kaupunki':
-                    city = value
+                read_details_row(dt, dd, grid, numeric)
             else:
                 print(f"Failed to find dt or dd in {dl}")
     else:
         print("Content section not found")
 
-    property_details = {
-        'Title': title,
-        'Price': price,
-        'Size': size,
-        'Address': address,
-        'Description': description,
-        'Building Year': building_year,
-        'Apartment Type': apartment_type,
-        'Debt-free Price': debt_free_price,
-        'Maintenance Charge': maintenance_charge,
-        'Living Area': living_area,
-        'Rooms': rooms,
-        'Floor': floor,
-        'Total Floors': total_floors,
-        'District': district,
-        'City': city,
-    }
+    listing_details = document.select_one(LISTING_DETAILS_SELECTOR)
+    if listing_details:
+        for row in listing_details.select('div.info-table__row'):
+            dt = row.select_one('dt.info-table__title')
+            dd = row.select_one('dd.info-table__value')
+            if dt and dd:
+                read_details_row(dt, dd, grid, numeric)
+    else:
+        print("Listing details not found")
 
-    return property_details
+    with metrics.timer('normalize'):
+        normalized = {field: parse_numeric_value(text, unit) for field, (text, unit) in numeric.items()}
+
+    values = {'Title': title, 'Address': address, 'Description': description, **grid, **normalized}
+    return {field: values.get(field, 'N/A') for field in HTML_FIELDS}
+
+def scrape_properties(listing_urls, handle, per_host=8, timeout=30, parser=None, workers=None, cache=None,
+                      refresh=None):
+    """
+    Fetch property details for many listings concurrently, passing each record on as it is parsed.
+
+    Pages are downloaded with up to `per_host` requests in flight per host.
+    With `workers` set to 0 each page is parsed in this process as soon as its
+    download finishes; otherwise pages are parsed in a pool of worker
+    processes while downloads continue.
+
+    Args:
+        listing_urls (list): The URLs of the property listings.
+        handle (callable): Called as `handle(url, property_details)` with a PropertyRecord for each
+            page retrieved, in completion order.
+        per_host (int, optional): Maximum concurrent requests per host. Defaults to 8.
+        timeout (float, optional): Timeout per request in seconds. Defaults to 30.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+        workers (int, optional): Parser processes, or 0 to parse in-process. Defaults to the number of CPUs.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in. Pages
+            that have not changed since the last crawl are not downloaded or parsed again.
+        refresh (set, optional): URLs known to have changed, downloaded even if they are cached.
+    """
+    def handle_record(url, property_details):
+        print(f'Scraped URL: {url}')
+        property_details = as_record(property_details)
+        if property_details is None:
+            return
+        property_details.url = url
+        if cache is not None:
+            cache.put_record(url, RECORD_KIND, property_details.to_dict())
+        handle(url, property_details)
+
+    if workers == 0:
+        def handle_page(url, status, body):
+            if status == 304:
+                handle_record(url, cache.get_record(url, RECORD_KIND))
+                return
+            if status != 200:
+                print(f'Failed to retrieve {url}. Status code: {status}')
+                return
+            handle_record(url, parse_property_details(body, parser))
+
+        fetch_all(listing_urls, handle_page, per_host, timeout, cache, RECORD_KIND, refresh=refresh)
+    else:
+        run_pipeline(
+            listing_urls,
+            partial(parse_property_details, parser=parser),
+            handle_record,
+            workers=workers,
+            per_host=per_host,
+            timeout=timeout,
+            cache=cache,
+            kind=RECORD_KIND,
+            refresh=refresh,
+        )
+
+def fetch_all_property_details(listing_urls, **kwargs):
+    """
+    Fetch property details for many listings concurrently.
+
+    Args:
+        listing_urls (list): The URLs of the property listings.
+        **kwargs: Passed on to `scrape_properties`.
+
+    Returns:
+        list: PropertyRecord objects, in completion order.
+    """
+    all_properties = []
+    scrape_properties(listing_urls, lambda url, property_details: all_properties.append(property_details), **kwargs)
+    return all_properties
 
 def save_to_csv(data, filename):
     """
     Save the property details to a CSV file.
     
     Args:
-        data (list): List of dictionaries containing property details.
+        data (list): PropertyRecord objects.
         filename (str): The name of the file to save the data to.
     """
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-        headers = [
-            'Title',
-            'Price (€)',
-            'Size (m²)',
-            'Address',
-            'Description',
-            'Building Year',
-            'Apartment Type',
-            'Debt-free Price (€)',
-            'Maintenance Charge (€ / month)',
-            'Living Area (m²)',
-            'Rooms',
-            'Floor',
-            'Total Floors',
-            'District',
-            'City',
-        ]
-        writer.writerow(headers)
-
+    with CsvSink(filename, flush_every=0) as sink:
+        sink.open()
         for item in data:
-            row = [
-                item['Title'],
-                item['Price'],
-                item['Size'],
-                item['Address'],
-                item['Description'],
-                item['Building Year'],
-                item['Apartment Type'],
-                item['Debt-free Price'],
-                item['Maintenance Charge'],
-                item['Living Area'],
-                item['Rooms'],
-                item['Floor'],
-                item['Total Floors'],
-                item['District'],
-                item['City'],
-            ]
-            writer.writerow(row)
-
-    print(f'Data saved to {filename}')
+            sink.write(item)
+
+def cache_path(cache_dir, default_path):
+    """
+    Place one of the crawl's state files in a cache directory.
+
+    Args:
+        cache_dir (str | None): The directory, or None to keep the default location.
+        default_path (str): The file's default path, e.g. `response_cache.DEFAULT_CACHE_PATH`.
+
+    Returns:
+        str: The path to use.
+    """
+    if cache_dir is None:
+        return default_path
+    return os.path.join(cache_dir, os.path.basename(default_path))
+
+def crawl(base_url, filename='properties.csv', sink=None, mode='http', per_host=8, workers=None, parser=None,
+          cache_dir=None, browsers=1):
+    """
+    Crawl a search and save the property details of every listing.
+
+    Progress is journaled per search, so a crawl that dies part way resumes
+    from the first unfinished listing without running discovery again.
+
+    Args:
+        base_url (str): The base URL to fetch the listings from.
+        filename (str, optional): The CSV file to write when no `sink` is given. Defaults to 'properties.csv'.
+        sink (optional): An open sink from `sinks` to write the records to; it is left open, so that
+            several searches can be written to one file.
+        mode (str, optional): Discovery mode, 'http' or 'selenium'. Defaults to 'http'.
+        per_host (int, optional): Maximum concurrent requests per host. Defaults to 8.
+        workers (int, optional): Parser processes, or 0 to parse in-process. Defaults to the number of CPUs.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+        cache_dir (str, optional): Directory for the response cache, crawl state and journal.
+            Defaults to '.scrape_cache'.
+        browsers (int, optional): Browsers loading results pages at once when Selenium is used. Defaults to 1.
+
+    Returns:
+        int: The number of records written.
+    """
+    if sink is None:
+        with CsvSink(filename) as sink:
+            return crawl(base_url, sink=sink, mode=mode, per_host=per_host, workers=workers, parser=parser,
+                         cache_dir=cache_dir, browsers=browsers)
+
+    written = sink.count
+    with CrawlJournal(journal_path(base_url, cache_path(cache_dir, DEFAULT_JOURNAL_DIR))) as journal:
+        listing_cards = journal.resume(base_url)
+        if listing_cards is None:
+            listing_cards = discover_listing_cards(base_url, mode, browsers)
+            journal.start(base_url, listing_cards)
+
+        with CrawlState(base_url, cache_path(cache_dir, DEFAULT_STATE_PATH)) as state, \
+                ResponseCache(cache_path(cache_dir, DEFAULT_CACHE_PATH)) as cache:
+            to_fetch, unchanged = state.plan(listing_cards)
+            for url, property_details in unchanged:
+                property_details = as_record(property_details)
+                property_details.url = url
+                sink.write(property_details)
+
+            def handle(url, property_details):
+                journal.record(url, property_details.to_dict())
+                state.update(url, property_details.to_dict())
+                sink.write(property_details)
+
+            remaining = []
+            for card in to_fetch:
+                if card['url'] in journal.completed:
+                    property_details = journal.completed[card['url']]
+                    state.update(card['url'], property_details)
+                    property_details = as_record(property_details)
+                    property_details.url = card['url']
+                    sink.write(property_details)
+                else:
+                    remaining.append(card['url'])
+
+            scrape_properties(remaining, handle, per_host=per_host, parser=parser, workers=workers, cache=cache,
+                              refresh=state.changed)
+
+        journal.finish()
+
+    written = sink.count - written
+    if not written:
+        print('No properties found.')
+
+    log_stats(session_stats())
+    return written
 
 def main():
     """
@@ -251,22 +823,12 @@ def main():
     """
     use_default = input('Do you want to use the default URL (Listings from Kalasatama area)? (yes/no): ').strip().lower()
     if use_default == 'yes':
-        base_url = 'https://asunnot.oikotie.fi/myytavat-asunnot?locations=%5B%5B5695451,4,%22Kalasatama,%20Helsinki%22%5D%5D&cardType=100&roomCount%5B%5D=2'
+        base_url = DEFAULT_SEARCH_URL
     else:
         base_url = input('Please enter the listings page URL: ')
 
-    listing_urls = fetch_listing_urls(base_url)
-
-    all_properties = []
-    for url in listing_urls:
-        property_details = fetch_property_details(url)
-        if property_details:
-            all_properties.append(property_details)
-
-    if all_properties:
-        save_to_csv(all_properties, 'properties.csv')
-    else:
-        print('No properties found.')
+    crawl(base_url)
+    metrics.get_registry().report()
 
 if __name__ == '__main__':
     main()
@@ -3,41 +3,64 @@ A web scraper to extract a single real estate property listing
 from a real estate website and save it to a CSV file.
 """
 
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 
-def fetch_property_details(url):
+from http_session import fetch
+from parsers import class_selector, parse_html
+from response_cache import ResponseCache
+
+DEFAULT_LISTING_URL = 'https://asunnot.oikotie.fi/myytavat-asunnot/hollola/17674777'
+
+# Key under which parsed records are cached for reuse on 304 responses.
+RECORD_KIND = 'single_listing'
+
+TITLE_SELECTOR = class_selector(
+    'h1',
+    'heading heading--no-styling listing-header__headline listing-header__headline--secondary customer-color margined margined--v15',
+)
+DETAILS_SELECTOR = 'body > main > section > div.content.content--primary-background.center-on-wallpaper.padded.padded--v30-h0.padded--desktop-v50-h15.padded--xdesktop-v50-h0.padded--topless > div > div > div.listing-columns__left > div.listing-details-container > div:nth-child(2) > dl'
+PRICE_SELECTOR = f'{DETAILS_SELECTOR} > div:nth-child(1) > dd'
+LOCATION_SELECTOR = f'{DETAILS_SELECTOR} > div:nth-child(2) > dd'
+
+def fetch_property_details(url, parser=None, cache=None):
     """
     Fetch property details from the given URL.
 
     Args:
         url (str): The URL of the property listing page.
+        parser (str, optional): Parser backend, one of `parsers.PARSERS`. Defaults to `parsers.DEFAULT_PARSER`.
+        cache (ResponseCache, optional): Cache to read from and store successful responses in. A page
+            that has not changed since the last run is not downloaded or parsed again.
 
     Returns:
         dict: A dictionary containing property details.
     """
-    response = requests.get(url)
+    status, content = fetch(url, cache, RECORD_KIND)
+
+    if status == 304:
+        return cache.get_record(url, RECORD_KIND)
 
-    if response.status_code != 200:
-        print(f'Failed to retrieve the page. Status code: {response.status_code}')
+    if status != 200:
+        print(f'Failed to retrieve the page. Status code: {status}')
         return {}
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    document = parse_html(content, parser)
     
     # Extract title
-    title = soup.find('h1', class_='heading heading--no-styling listing-header__headline listing-header__headline--secondary customer-color margined margined--v15').text.strip() if soup.find('h1', class_='heading heading--no-styling listing-header__headline listing-header__headline--secondary customer-color margined margined--v15') else 'N/A'
+    title_tag = document.select_one(TITLE_SELECTOR)
+    title = title_tag.text().strip() if title_tag else 'N/A'
     
     # Extract price using the detailed CSS selector path
-    price = soup.select_one('body > main > section > div.content.content--primary-background.center-on-wallpaper.padded.padded--v30-h0.padded--desktop-v50-h15.padded--xdesktop-v50-h0.padded--topless > div > div > div.listing-columns__left > div.listing-details-container > div:nth-child(2) > dl > div:nth-child(1) > dd').text.strip() if soup.select_one('body > main > section > div.content.content--primary-background.center-on-wallpaper.padded.padded--v30-h0.padded--desktop-v50-h15.padded--xdesktop-v50-h0.padded--topless > div > div > div.listing-columns__left > div.listing-details-container > div:nth-child(2) > dl > div:nth-child(1) > dd') else 'N/A'
+    price_tag = document.select_one(PRICE_SELECTOR)
+    price = price_tag.text().strip() if price_tag else 'N/A'
     
     # Extract location
-    location_tag = soup.select_one('body > main > section > div.content.content--primary-background.center-on-wallpaper.padded.padded--v30-h0.padded--desktop-v50-h15.padded--xdesktop-v50-h0.padded--topless > div > div > div.listing-columns__left > div.listing-details-container > div:nth-child(2) > dl > div:nth-child(2) > dd')
-    location = ' '.join([part.text for part in location_tag.find_all('span', class_='link__text')]) if location_tag else 'N/A'
+    location_tag = document.select_one(LOCATION_SELECTOR)
+    location = ' '.join([part.text() for part in location_tag.select('span.link__text')]) if location_tag else 'N/A'
     
     # Extract description
-    description_tag = soup.find('div', class_='listing-overview')
-    description = ' '.join([p.text.strip() for p in description_tag.find_all('p')]) if description_tag else 'N/A'
+    description_tag = document.select_one('div.listing-overview')
+    description = ' '.join([p.text().strip() for p in description_tag.select('p')]) if description_tag else 'N/A'
 
     property_details = {
         'Title': title,
@@ -46,6 +69,8 @@ def fetch_property_details(url):
         'Description': description
     }
 
+    if cache is not None:
+        cache.put_record(url, RECORD_KIND, property_details)
     return property_details
 
 def save_to_csv(data, filename):
@@ -56,16 +81,38 @@ def save_to_csv(data, filename):
         data (dict): A dictionary containing property details.
         filename (str): The name of the CSV file.
     """
-    df = pd.DataFrame([data])
-    df.to_csv(filename, index=False)
+    save_records([data], filename)
+
+def save_records(records, filename, format='csv'):
+    """
+    Save the details of one or more listings to a file.
+
+    Args:
+        records (list): Dictionaries containing property details.
+        filename (str): The name of the file.
+        format (str, optional): 'csv', 'jsonl' or 'parquet'. Defaults to 'csv'.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    df = pd.DataFrame(records)
+    if format == 'csv':
+        df.to_csv(filename, index=False)
+    elif format == 'jsonl':
+        df.to_json(filename, orient='records', lines=True, force_ascii=False)
+    elif format == 'parquet':
+        df.to_parquet(filename, index=False)
+    else:
+        raise ValueError(f"Unknown output format '{format}'. Choose one of: csv, jsonl, parquet")
     print(f'Data saved to {filename}')
 
 def main():
     """
     Main function to scrape the real estate website and save data to CSV.
     """
-    url = 'https://asunnot.oikotie.fi/myytavat-asunnot/hollola/17674777'
-    property_details = fetch_property_details(url)
+    url = DEFAULT_LISTING_URL
+    with ResponseCache() as cache:
+        property_details = fetch_property_details(url, cache=cache)
     if property_details:
         save_to_csv(property_details, 'property_details.csv')
 
@@ -0,0 +1,157 @@
+"""
+Browser-free listing discovery through the JSON search API used by the site's front end.
+"""
+
+import re
+from urllib.parse import parse_qsl, urlsplit
+
+from cards import join_summary, make_card
+from http_session import get, get_session
+
+API_PATH = '/api/cards'
+PAGE_SIZE = 24
+
+TOKEN_META = {
+    'OTA-token': 'api-token',
+    'OTA-loaded': 'loaded',
+    'OTA-cuid': 'cuid',
+}
+
+
+def fetch_api_headers(base_url, session=None):
+    """
+    Read the API session headers the front end embeds as meta tags in the search page.
+
+    Args:
+        base_url (str): A search results page URL.
+        session (requests.Session, optional): Session used for the request. Defaults to the shared session.
+
+    Returns:
+        dict: The OTA-* headers required by the search API.
+
+    Raises:
+        ValueError: If the page does not contain the expected meta tags.
+    """
+    response = get(base_url, session)
+    response.raise_for_status()
+
+    headers = {}
+    for header, meta_name in TOKEN_META.items():
+        match = re.search(rf'<meta\s+name="{meta_name}"\s+content="([^"]*)"', response.text)
+        if not match:
+            raise ValueError(f'Search page has no "{meta_name}" meta tag')
+        headers[header] = match.group(1)
+    return headers
+
+
+def api_url(base_url):
+    """
+    Return the search API endpoint on the same site as a search results page.
+
+    Args:
+        base_url (str): A search results page URL.
+
+    Returns:
+        str: e.g. 'https://asunnot.oikotie.fi/api/cards'.
+    """
+    parts = urlsplit(base_url)
+    return f'{parts.scheme}://{parts.netloc}{API_PATH}'
+
+
+def search_params(base_url):
+    """
+    Convert a search results page URL into search API query parameters.
+
+    Args:
+        base_url (str): A search results page URL, e.g. with `locations`, `cardType` and `roomCount[]`.
+
+    Returns:
+        list: (name, value) pairs, without any `pagination` parameter.
+    """
+    query = parse_qsl(urlsplit(base_url).query, keep_blank_values=True)
+    return [(name, value) for name, value in query if name != 'pagination']
+
+
+def card_summary(card):
+    """
+    Build the visible summary of a search API card from its price, size and room layout.
+
+    The values are the ones the search page shows on the card, so the summary
+    matches the one Selenium discovery reads.
+
+    Args:
+        card (dict): One card from the search API response.
+
+    Returns:
+        str: e.g. '435 000 € | 52,5 m² | 2h+avok+kph'.
+    """
+    data = card.get('data') or card
+    return join_summary(data.get(key, '') for key in ('price', 'size', 'roomConfiguration'))
+
+
+def parse_cards_response(payload):
+    """
+    Extract listing cards from one search API response.
+
+    Args:
+        payload (dict): The decoded JSON response.
+
+    Returns:
+        tuple: (list of card dictionaries, total number of results found).
+    """
+    cards = payload.get('cards', [])
+    listing_cards = [make_card(card['url'], card_summary(card)) for card in cards if card.get('url')]
+    return listing_cards, payload.get('found', len(cards))
+
+
+def fetch_listing_urls_http(base_url, session=None, page_size=PAGE_SIZE):
+    """
+    Fetch all listing URLs for a search from the JSON search API.
+
+    Args:
+        base_url (str): The search results page URL.
+        session (requests.Session, optional): Session used for the requests. Defaults to the shared session.
+        page_size (int, optional): Cards requested per API call. Defaults to 24.
+
+    Returns:
+        list: A list of listing URLs, in the order the site returns them.
+    """
+    return [card['url'] for card in fetch_listing_cards_http(base_url, session, page_size)]
+
+
+def fetch_listing_cards_http(base_url, session=None, page_size=PAGE_SIZE):
+    """
+    Fetch all listing cards for a search from the JSON search API.
+
+    Args:
+        base_url (str): The search results page URL.
+        session (requests.Session, optional): Session used for the requests. Defaults to the shared session.
+        page_size (int, optional): Cards requested per API call. Defaults to 24.
+
+    Returns:
+        list: Card dictionaries ({'id', 'url', 'summary'}), in the order the site returns them.
+    """
+    session = session or get_session()
+    headers = fetch_api_headers(base_url, session)
+    params = search_params(base_url)
+    url = api_url(base_url)
+
+    all_listing_cards = []
+    offset = 0
+    while True:
+        response = get(
+            url,
+            session,
+            params=params + [('limit', page_size), ('offset', offset)],
+            headers=headers,
+        )
+        response.raise_for_status()
+        listing_cards, found = parse_cards_response(response.json())
+        print(f'Found {len(listing_cards)} listing URLs at offset {offset} (of {found})')
+
+        all_listing_cards.extend(listing_cards)
+        offset += page_size
+        if not listing_cards or offset >= found:
+            break
+
+    return all_listing_cards
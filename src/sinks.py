@@ -0,0 +1,468 @@
+"""
+Output sinks that write property records as they are scraped.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import time
+
+import metrics
+from cards import card_id
+from records import FIELDS, to_text
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CSV_COLUMNS = [
+    ('Title', 'Title'),
+    ('Price (€)', 'Price'),
+    ('Size (m²)', 'Size'),
+    ('Address', 'Address'),
+    ('Description', 'Description'),
+    ('Building Year', 'Building Year'),
+    ('Apartment Type', 'Apartment Type'),
+    ('Debt-free Price (€)', 'Debt-free Price'),
+    ('Maintenance Charge (€ / month)', 'Maintenance Charge'),
+    ('Living Area (m²)', 'Living Area'),
+    ('Rooms', 'Rooms'),
+    ('Floor', 'Floor'),
+    ('Total Floors', 'Total Floors'),
+    ('District', 'District'),
+    ('City', 'City'),
+]
+
+
+class CsvSink:
+    """
+    Append property records to a semicolon-delimited CSV file one at a time.
+
+    Missing values are written as 'N/A' and whole numbers without decimals.
+
+    The file is created with its header row on the first record, so an empty
+    crawl leaves no file behind. Records already written survive a crash;
+    `flush_every` and `fsync` control how soon they reach the disk.
+    """
+
+    def __init__(self, filename, flush_every=1, fsync=False):
+        """
+        Args:
+            filename (str): The name of the file to write.
+            flush_every (int, optional): Flush the file buffer after this many records, or 0 to flush
+                only on close. Defaults to 1.
+            fsync (bool, optional): Also fsync on every flush. Defaults to False.
+        """
+        self.filename = filename
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        """
+        Create the file and write the header row, if not done yet.
+        """
+        if self._file is not None:
+            return
+        self._file = open(self.filename, mode='w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        self._writer.writerow([header for header, _ in CSV_COLUMNS])
+
+    def flush(self):
+        """
+        Flush buffered rows to the operating system, and to disk if `fsync` is set.
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def write(self, item):
+        """
+        Append one property record.
+
+        Args:
+            item (PropertyRecord): The property details.
+        """
+        with metrics.timer('write'):
+            self.open()
+            self._writer.writerow([to_text(item[key]) for _, key in CSV_COLUMNS])
+        metrics.inc('records_written_total')
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def close(self):
+        """
+        Flush and close the file.
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            print(f'Data saved to {self.filename}')
+
+
+class JsonLinesSink:
+    """
+    Append property records to a JSON Lines file, one object per line, with every scraped field.
+
+    Numbers are written as JSON numbers and missing values as null.
+    """
+
+    def __init__(self, filename, flush_every=1, fsync=False):
+        """
+        Args:
+            filename (str): The name of the file to write.
+            flush_every (int, optional): Flush the file buffer after this many records, or 0 to flush
+                only on close. Defaults to 1.
+            fsync (bool, optional): Also fsync on every flush. Defaults to False.
+        """
+        self.filename = filename
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        """
+        Create the file, if not done yet.
+        """
+        if self._file is None:
+            self._file = open(self.filename, mode='w', encoding='utf-8')
+
+    def flush(self):
+        """
+        Flush buffered lines to the operating system, and to disk if `fsync` is set.
+        """
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def write(self, item):
+        """
+        Append one property record.
+
+        Args:
+            item (PropertyRecord): The property details.
+        """
+        with metrics.timer('write'):
+            self.open()
+            self._file.write(json.dumps(item.to_dict(), ensure_ascii=False) + '\n')
+        metrics.inc('records_written_total')
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def close(self):
+        """
+        Flush and close the file.
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            print(f'Data saved to {self.filename}')
+
+
+# Low-cardinality text columns stored as dictionary indices in Parquet.
+DICTIONARY_FIELDS = (
+    'Apartment Type', 'District', 'City', 'Condition', 'Housing Type', 'Heating', 'Energy Class',
+    'Building Material', 'Elevator', 'Sauna', 'Balcony', 'Plot Ownership',
+)
+
+
+def parquet_schema():
+    """
+    Build the Arrow schema for property records: one typed, nullable column per field.
+
+    Returns:
+        pyarrow.Schema: The schema.
+    """
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+    return pa.schema([
+        (field, pa.dictionary(pa.int32(), pa.string()) if field in DICTIONARY_FIELDS else types[kind])
+        for field, _, kind in FIELDS
+    ])
+
+
+class ParquetSink:
+    """
+    Write property records to a Parquet file, one row group at a time.
+
+    Records are buffered and written as a row group every `row_group_size`
+    records, so memory stays bounded however long the crawl. Numbers keep
+    their types, missing values are nulls, and City, District and Apartment
+    Type are dictionary-encoded. The file is only readable once `close` has
+    written its footer.
+    """
+
+    def __init__(self, filename, row_group_size=1000, compression='zstd'):
+        """
+        Args:
+            filename (str): The name of the file to write.
+            row_group_size (int, optional): Records per row group. Defaults to 1000.
+            compression (str, optional): Parquet compression codec. Defaults to 'zstd'.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        if pa is None:
+            raise ImportError('Parquet output needs pyarrow: pip install pyarrow')
+        self.filename = filename
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schema = parquet_schema()
+        self.count = 0
+        self._buffer = []
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        """
+        Create the file, if not done yet.
+        """
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.filename, self.schema, compression=self.compression)
+
+    def flush(self):
+        """
+        Write the buffered records as a row group.
+        """
+        if not self._buffer:
+            return
+        self.open()
+        columns = {field: [getattr(record, attribute) for record in self._buffer] for field, attribute, _ in FIELDS}
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+        self._buffer = []
+
+    def write(self, item):
+        """
+        Append one property record.
+
+        Args:
+            item (PropertyRecord): The property details.
+        """
+        with metrics.timer('write'):
+            self._buffer.append(item)
+            if len(self._buffer) >= self.row_group_size:
+                self.flush()
+        metrics.inc('records_written_total')
+        self.count += 1
+
+    def close(self):
+        """
+        Write the last row group and the file footer.
+        """
+        if self._buffer or self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+            print(f'Data saved to {self.filename}')
+
+
+SQLITE_TYPES = {int: 'INTEGER', float: 'REAL', str: 'TEXT'}
+
+# Record attributes whose changes are kept in the price_history table.
+HISTORY_ATTRIBUTES = ('price', 'maintenance_charge')
+
+
+class SqliteSink:
+    """
+    Upsert property records into a SQLite database, keyed by listing ID.
+
+    Unlike the file sinks, the database is kept between runs: each listing
+    has one row in `properties` that is inserted or updated in place, and
+    every new or changed Price or Maintenance Charge is appended to
+    `price_history`. Records are written in batches of `batch_size`, one
+    transaction per batch, with the database in WAL mode so it can be
+    queried while a crawl writes to it. `properties` is indexed on city,
+    district and price. `count` is the number of distinct listings written,
+    so records repeated within a run are counted once.
+    """
+
+    def __init__(self, filename, batch_size=500):
+        """
+        Args:
+            filename (str): The SQLite database to write.
+            batch_size (int, optional): Records per transaction. Defaults to 500.
+        """
+        self.filename = filename
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch = {}
+        self._ids = set()
+        self._connection = None
+        columns = [attribute for _, attribute, _ in FIELDS]
+        self._upsert = (
+            f"INSERT INTO properties (id, {', '.join(columns)}, first_seen, last_seen) "
+            f"VALUES (?, {', '.join('?' for _ in columns)}, ?, ?) "
+            f"ON CONFLICT (id) DO UPDATE SET "
+            f"{', '.join(f'{column} = excluded.{column}' for column in columns)}, last_seen = excluded.last_seen"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        """
+        Open the database and create its tables and indexes, if not done yet.
+        """
+        if self._connection is not None:
+            return
+        columns = ',\n'.join(f'    {attribute} {SQLITE_TYPES[kind]}' for _, attribute, kind in FIELDS)
+        self._connection = sqlite3.connect(self.filename)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.executescript(f"""
+CREATE TABLE IF NOT EXISTS properties (
+    id TEXT PRIMARY KEY,
+{columns},
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS properties_city ON properties (city);
+CREATE INDEX IF NOT EXISTS properties_district ON properties (district);
+CREATE INDEX IF NOT EXISTS properties_price ON properties (price);
+CREATE TABLE IF NOT EXISTS price_history (
+    id TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    price INTEGER,
+    maintenance_charge REAL
+);
+CREATE INDEX IF NOT EXISTS price_history_id ON price_history (id, observed_at);
+""")
+        # Databases written before a field was added get the column now.
+        existing = {row[1] for row in self._connection.execute('PRAGMA table_info(properties)')}
+        for _, attribute, kind in FIELDS:
+            if attribute not in existing:
+                self._connection.execute(f'ALTER TABLE properties ADD COLUMN {attribute} {SQLITE_TYPES[kind]}')
+
+    def flush(self):
+        """
+        Upsert the buffered records and record price changes in one transaction.
+        """
+        if not self._batch:
+            return
+        self.open()
+        now = time.time()
+        batch, self._batch = self._batch, {}
+        ids = list(batch)
+        with self._connection:
+            stored = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                stored.update(
+                    (row[0], row[1:])
+                    for row in self._connection.execute(
+                        f"SELECT id, {', '.join(HISTORY_ATTRIBUTES)} FROM properties "
+                        f"WHERE id IN ({', '.join('?' for _ in chunk)})",
+                        chunk,
+                    )
+                )
+            history = []
+            for listing_id, record in batch.items():
+                values = tuple(getattr(record, attribute) for attribute in HISTORY_ATTRIBUTES)
+                if stored.get(listing_id) != values:
+                    history.append((listing_id, now, *values))
+            self._connection.executemany(
+                f"INSERT INTO price_history (id, observed_at, {', '.join(HISTORY_ATTRIBUTES)}) VALUES (?, ?, ?, ?)",
+                history,
+            )
+            self._connection.executemany(
+                self._upsert,
+                [
+                    (listing_id, *(getattr(record, attribute) for _, attribute, _ in FIELDS), now, now)
+                    for listing_id, record in batch.items()
+                ],
+            )
+
+    def write(self, item):
+        """
+        Queue one property record for upserting.
+
+        Args:
+            item (PropertyRecord): The property details; its URL identifies the listing.
+        """
+        if not item.url:
+            print(f'Skipping record without a URL: {item!r}')
+            return
+        listing_id = card_id(item.url)
+        with metrics.timer('write'):
+            self._batch[listing_id] = item
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        if listing_id not in self._ids:
+            self._ids.add(listing_id)
+            metrics.inc('records_written_total')
+            self.count += 1
+
+    def close(self):
+        """
+        Write the last batch and close the database.
+        """
+        if self._batch or self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+            print(f'Data saved to {self.filename}')
+
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonLinesSink,
+    'parquet': ParquetSink,
+    'sqlite': SqliteSink,
+}
+
+
+def open_sink(filename, format='csv', **kwargs):
+    """
+    Create the sink for an output format.
+
+    Args:
+        filename (str): The name of the file to write.
+        format (str, optional): One of `SINKS`. Defaults to 'csv'.
+        **kwargs: Passed to the sink's constructor.
+
+    Returns:
+        The sink, usable as a context manager.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if format not in SINKS:
+        raise ValueError(f"Unknown output format '{format}'. Choose one of: {', '.join(SINKS)}")
+    return SINKS[format](filename, **kwargs)